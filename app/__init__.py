@@ -1,22 +1,75 @@
+""" Application factory and the extensions shared by every module. """
 import os
 
 from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from flask_sqlalchemy import SQLAlchemy
 
-# Config
-app = Flask(__name__)
-CORS(app)
-socketio = SocketIO(app)
+from app.database import RoutingSQLAlchemy
 
-CORS(app)
-app_settings = os.getenv('APP_SETTINGS', 'app.config.DevConfig')
-app.config.from_object(app_settings)
+# Extensions are created unbound so importing the package is cheap and
+# doesn't need any config, `create_app` binds them to an application.
+cors = CORS()
+socketio = SocketIO()
+db = RoutingSQLAlchemy()
 
-# DB Connection
-db = SQLAlchemy(app)
 
-from app.nodes.views import node_app
+def create_app(settings=None):
+    """ Creates and configures the application.
 
-app.register_blueprint(node_app, url_prefix='/api/nodes')
+    Notes:
+        The blueprint is imported before Socket.IO is bound, so its event
+        handlers are registered on every server `create_app` builds.
+
+    Args:
+        settings (str): Import path of the config class, defaults to the
+            APP_SETTINGS env var or `app.config.DevConfig`.
+
+    Returns:
+        Flask: The configured application.
+
+    Raises:
+        RuntimeError: If no database URL is configured.
+    """
+    from app.database import init_db
+    from app.encoders import json_backend
+    from app.jobs import runner
+    from app.metrics import init_metrics
+    from app.mirror import mirror
+    from app.nodes.views import node_app
+    from app.sockets import socketio_options
+
+    app = Flask(__name__)
+    app.config.from_object(
+        settings or os.getenv('APP_SETTINGS', 'app.config.DevConfig')
+    )
+
+    if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+        raise RuntimeError('DATABASE_URL is not set')
+
+    cors.init_app(app)
+
+    # JSON
+    json_backend.init_app(app)
+
+    # Sockets
+    socketio.init_app(
+        app, json=json_backend, **socketio_options(app.config)
+    )
+
+    # DB Connection
+    init_db(app)
+    db.init_app(app)
+
+    # Metrics
+    init_metrics(app)
+
+    app.register_blueprint(node_app, url_prefix='/api/nodes')
+
+    # Tree mirror
+    mirror.init_app(app)
+
+    # Background jobs
+    runner.init_app(app)
+
+    return app
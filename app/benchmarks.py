@@ -0,0 +1,595 @@
+""" Module with performance benchmarks run through manage.py commands. """
+# Modules
+import json
+import math
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from os.path import abspath, dirname
+from random import randint
+from time import perf_counter
+from urllib.request import urlopen
+
+from sqlalchemy import String, cast, func, select
+
+# db
+from app import db
+from app.cache import root_cache, tree_cache
+from app.encoders import LOADERS
+from app.models import Node
+
+# Utils
+from app import events
+from app.events import changes
+
+# Name of the node `seed_tree` hangs the benchmark tree from.
+BENCH_TREE = 'bench-tree'
+
+# Fresh interpreters started per phase by `bench_startup`.
+STARTUP_RUNS = 5
+# Code timed by `bench_startup`, each run in a new interpreter.
+STARTUP_PHASES = {
+    'import':     'import app',
+    'create_app': 'from app import create_app; create_app()',
+}
+PROJECT_DIR = dirname(dirname(abspath(__file__)))
+
+
+def _orm_children(parent, count):
+    """ Recreates children the way create_sub_nodes used to.
+
+    Notes:
+        Kept only as the baseline of `bench_sub_nodes`: an ORM delete and
+        commit, then one ORM object and INSERT per child and a second commit.
+
+    Args:
+        parent (Node): Node to generate children for.
+        count (int): Amount of children to generate.
+    """
+    Node.query.filter_by(parent=parent).delete()
+    db.session.commit()
+
+    for i in range(count):
+        node = Node(name=str(randint(parent.min_num, parent.max_num)))
+        node.can_have_children = False
+        node.parent = parent
+        db.session.add(node)
+    db.session.commit()
+
+
+def _bulk_children(parent, count):
+    """ Recreates children with the bulk path used by create_sub_nodes.
+
+    Args:
+        parent (Node): Node to generate children for.
+        count (int): Amount of children to generate.
+    """
+    Node.regenerate_children(parent, count)
+    db.session.commit()
+
+
+def bench_sub_nodes(count=1000, runs=5):
+    """ Compares rows/sec of the ORM and bulk children generation paths.
+
+    Notes:
+        Uses a temporary parent node which is deleted, with its children,
+        once done.
+
+    Args:
+        count (int): Amount of children generated per run.
+        runs (int): Amount of runs per path, the best run is reported.
+
+    Returns:
+        dict: Rows per second of each path.
+    """
+    parent = Node('bench-sub-nodes')
+    db.session.add(parent)
+    db.session.commit()
+
+    paths = (('orm', _orm_children), ('bulk', _bulk_children))
+    results = {}
+
+    try:
+        for label, generate in paths:
+            best = None
+
+            for i in range(runs):
+                start = perf_counter()
+                generate(parent, count)
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            results[label] = count / best
+
+    finally:
+        table = Node.__table__
+        db.session.execute(
+            table.delete().where(table.c.parent_id == parent.id)
+        )
+        db.session.delete(parent)
+        db.session.commit()
+
+    return results
+
+
+def percentile(samples, fraction):
+    """ Returns the nearest rank percentile of sorted samples.
+
+    Args:
+        samples (list): Sorted values.
+        fraction (float): Value between 0 and 1, e.g. 0.99 for p99.
+
+    Returns:
+        float: Value of the percentile, None without samples.
+    """
+    if not samples:
+        return None
+
+    index = min(len(samples), math.ceil(fraction * len(samples))) - 1
+    return samples[max(index, 0)]
+
+
+def load_test(url, concurrency=50, total=1000):
+    """ Fires GET requests at a running server from concurrent clients.
+
+    Notes:
+        Meant to be pointed at the gunicorn eventlet worker to see how many
+        requests it overlaps, e.g. with and without psycogreen or with
+        different pool sizes.
+
+    Args:
+        url (str): Value of URL to request.
+        concurrency (int): Amount of requests in flight at once.
+        total (int): Amount of requests to send.
+
+    Returns:
+        dict: Throughput, p50 / p99 latency in ms and amount of errors.
+    """
+    def fetch(i):
+        start = perf_counter()
+
+        try:
+            with urlopen(url) as response:
+                response.read()
+
+        except Exception:
+            return None
+
+        return (perf_counter() - start) * 1000
+
+    start = perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(fetch, range(total)))
+
+    elapsed = perf_counter() - start
+    latencies = sorted(t for t in timings if t is not None)
+
+    return {
+        'requests_per_sec': total / elapsed,
+        'p50_ms':           percentile(latencies, 0.5),
+        'p99_ms':           percentile(latencies, 0.99),
+        'errors':           total - len(latencies),
+    }
+
+
+# ------------------------------------------
+#   API benchmark
+# ------------------------------------------
+
+def seed_tree(depth=3, fanout=10, total=1000):
+    """ Seeds a benchmark tree under the Root, one INSERT per level.
+
+    Notes:
+        Levels are filled breadth first until `total` nodes exist, the last
+        level holds leaves. A previous benchmark tree is deleted first. The
+        tree is committed with one `subtree:regenerated` change, so caches
+        and mirrors of running workers pick it up.
+
+    Args:
+        depth (int): Levels below the benchmark tree node.
+        fanout (int): Children per node.
+        total (int): Maximum amount of nodes, including the tree node.
+
+    Returns:
+        Node: Top of the benchmark tree.
+    """
+    drop_tree()
+    top = Node(BENCH_TREE)
+    top.parent_id = root_cache.get()
+    db.session.add(top)
+    db.session.flush()
+
+    table = Node.__table__
+    parent = table.alias('parent')
+    parent_path = select([parent.c.path]) \
+        .where(parent.c.id == table.c.parent_id).as_scalar()
+    parent_ids = [top.id]
+    remaining = total - 1
+    parents = 0
+
+    for level in range(1, depth + 1):
+        rows = []
+
+        for parent_id in parent_ids:
+            for i in range(min(fanout, remaining - len(rows))):
+                min_num, max_num = Node.random_range()
+                rows.append({
+                    'name':              f'bench-{level}-{len(rows)}',
+                    'parent_id':         parent_id,
+                    'can_have_children': level < depth,
+                    'min_num':           min_num,
+                    'max_num':           max_num,
+                })
+
+        if not rows:
+            break
+
+        parents += len({row['parent_id'] for row in rows})
+        db.session.execute(table.insert(), rows)
+        parent_ids = [
+            pk for pk, in db.session.execute(
+                select([table.c.id]).where(table.c.path.is_(None))
+            )
+        ]
+        db.session.execute(
+            table.update()
+            .where(table.c.path.is_(None))
+            .values(path=parent_path + cast(table.c.id, String) + '/')
+        )
+        remaining -= len(rows)
+
+    changes.publish(
+        events.SUBTREE_REGENERATED,
+        root_id=top.id,
+        count=fanout,
+        parents=parents
+    )
+    return top
+
+
+def drop_tree():
+    """ Deletes the benchmark tree, if any, and publishes the delete. """
+    top = Node.query.filter_by(name=BENCH_TREE).first()
+
+    if top is not None:
+        deleted = {'id': top.id, 'parent_id': top.parent_id}
+        Node.delete_subtree(top)
+        changes.publish(events.NODE_DELETED, **deleted)
+
+
+def _summary(timings, elapsed):
+    """ Summarizes the latencies of sequential runs.
+
+    Args:
+        timings (list): Latency of every run in seconds.
+        elapsed (float): Seconds all runs took.
+
+    Returns:
+        dict: Throughput and p50 / p99 latency in ms.
+    """
+    latencies = sorted(t * 1000 for t in timings)
+
+    return {
+        'runs':          len(latencies),
+        'ops_per_sec':   len(latencies) / elapsed if elapsed else None,
+        'p50_ms':        percentile(latencies, 0.5),
+        'p99_ms':        percentile(latencies, 0.99),
+    }
+
+
+def _measure(run, runs):
+    """ Calls `run` sequentially and summarizes its latency.
+
+    Args:
+        run (callable): Takes the run index, raises on failure.
+        runs (int): Amount of calls.
+
+    Returns:
+        dict: Value of `_summary`.
+    """
+    timings = []
+    start = perf_counter()
+
+    for i in range(runs):
+        begin = perf_counter()
+        run(i)
+        timings.append(perf_counter() - begin)
+
+    return _summary(timings, perf_counter() - start)
+
+
+def _expect(response, status):
+    """ Fails the benchmark on an unexpected response status.
+
+    Args:
+        response (Response): Test client response.
+        status (int): Expected status code.
+    """
+    if response.status_code != status:
+        raise RuntimeError(
+            f'{response.status_code} instead of {status}: {response.data}'
+        )
+
+
+def bench_fanout(app, clients=50, runs=20):
+    """ Measures full tree `update` broadcasts to simulated clients.
+
+    Notes:
+        Runs with no broadcast window or client rate limit, so every
+        `update:nodes` serializes (from cache) and emits once. Needs the
+        in-process Socket.IO server, None is returned with a message queue.
+
+    Args:
+        app (Flask): Application to connect the clients to.
+        clients (int): Amount of connected clients.
+        runs (int): Amount of broadcasts.
+
+    Returns:
+        dict: Value of `_summary` plus the amount of clients reached.
+    """
+    from socketio import PubSubManager
+
+    from app import socketio
+
+    if isinstance(socketio.server.manager, PubSubManager):
+        return None
+
+    config = app.config
+    saved = config['BROADCAST_WINDOW'], config['BROADCAST_CLIENT_INTERVAL']
+    config['BROADCAST_WINDOW'] = config['BROADCAST_CLIENT_INTERVAL'] = 0
+    connected = [socketio.test_client(app) for i in range(clients)]
+    received = []
+
+    def broadcast(i):
+        connected[0].emit('update:nodes')
+        received.append(sum(
+            any(packet['name'] == 'update' for packet in c.get_received())
+            for c in connected
+        ))
+
+    try:
+        results = _measure(broadcast, runs)
+
+    finally:
+        config['BROADCAST_WINDOW'], config['BROADCAST_CLIENT_INTERVAL'] = \
+            saved
+
+        for client in connected:
+            client.disconnect()
+
+    results['clients_reached'] = min(received) if received else 0
+    return results
+
+
+def bench_startup(runs=STARTUP_RUNS):
+    """ Measures the cold start of a worker or CLI invocation.
+
+    Notes:
+        Every run is a new Python process, so the timings include the
+        interpreter start and every import, like a container boot. The
+        environment is inherited, DATABASE_URL must be set for create_app.
+
+    Args:
+        runs (int): Amount of processes started per phase.
+
+    Returns:
+        dict: Value of `_summary` per key of STARTUP_PHASES.
+    """
+    def start(code):
+        return lambda i: subprocess.check_call(
+            [sys.executable, '-c', code], cwd=PROJECT_DIR
+        )
+
+    return {
+        phase: _measure(start(code), runs)
+        for phase, code in STARTUP_PHASES.items()
+    }
+
+
+def bench_api(app, depth=3, fanout=10, total=1000, runs=50, clients=50):
+    """ Seeds a tree then measures the main node API operations.
+
+    Notes:
+        Requests go through the Flask test client, so timings include
+        routing, SQL and serialization but no network. The benchmark tree
+        is deleted once done.
+
+    Args:
+        app (Flask): Application to benchmark.
+        depth (int): Levels of the seeded tree.
+        fanout (int): Children per seeded node.
+        total (int): Maximum amount of seeded nodes.
+        runs (int): Amount of runs per operation.
+        clients (int): Amount of Socket.IO clients of the fan-out run.
+
+    Returns:
+        dict: Machine readable results, see `write_results`.
+    """
+    start = perf_counter()
+    top = seed_tree(depth, fanout, total)
+    seed_seconds = perf_counter() - start
+    table = Node.__table__
+
+    # Deepest nodes that can have children, the targets of create_sub_nodes.
+    inner = [
+        pk for pk, in db.session.execute(
+            select([table.c.id])
+            .where(table.c.path.like(top.path + '%'))
+            .where(table.c.can_have_children)
+            .order_by(table.c.path.desc())
+            .limit(runs)
+        )
+    ]
+    client = app.test_client()
+    max_sub_nodes = app.config['MAX_SUB_NODES']
+
+    def get_tree(i):
+        _expect(client.get('/api/nodes/'), 200)
+
+    def get_tree_cold(i):
+        tree_cache.invalidate()
+        _expect(client.get('/api/nodes/'), 200)
+
+    def get_subtree(i):
+        _expect(client.get(f'/api/nodes/{top.id}/'), 200)
+
+    def put_node(i):
+        min_num, max_num = Node.random_range()
+        _expect(client.put(
+            f'/api/nodes/{inner[i % len(inner)]}/',
+            data=json.dumps({'min_num': min_num, 'max_num': max_num}),
+            content_type='application/json'
+        ), 200)
+
+    def create_sub_nodes(i):
+        _expect(client.post(
+            f'/api/nodes/{inner[i % len(inner)]}/nodes/',
+            data=json.dumps({'count': max_sub_nodes}),
+            content_type='application/json'
+        ), 200)
+
+    try:
+        nodes = db.session.query(func.count(Node.id)) \
+            .filter(Node.path.like(top.path + '%')).scalar()
+        results = {
+            'get_tree':         _measure(get_tree, runs),
+            'get_tree_cold':    _measure(get_tree_cold, runs),
+            'get_subtree':      _measure(get_subtree, runs),
+            'put_node':         _measure(put_node, runs),
+            'create_sub_nodes': _measure(create_sub_nodes, runs),
+            'update_fanout':    bench_fanout(app, clients, runs),
+        }
+        results.update(
+            (f'startup_{phase}', summary)
+            for phase, summary in bench_startup().items()
+        )
+
+    finally:
+        db.session.rollback()
+        drop_tree()
+
+    return {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'commit':     _git_commit(),
+        'database':   db.engine.dialect.name,
+        'shape':      {
+            'depth':        depth,
+            'fanout':       fanout,
+            'nodes':        nodes,
+            'seed_seconds': seed_seconds,
+        },
+        'runs':       runs,
+        'clients':    clients,
+        'results':    results,
+    }
+
+
+def _git_commit():
+    """ Returns the commit being benchmarked.
+
+    Returns:
+        str: Value of HEAD commit hash, None outside of a git checkout.
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, path):
+    """ Appends benchmark results to a JSON lines file.
+
+    Notes:
+        One line per run so results of different commits can be compared,
+        e.g. with `jq`.
+
+    Args:
+        results (dict): Value returned by `bench_api`.
+        path (str): Value of file path.
+    """
+    with open(path, 'a') as output:
+        output.write(json.dumps(results, sort_keys=True) + '\n')
+
+
+# ------------------------------------------
+#   JSON benchmark
+# ------------------------------------------
+
+def fake_tree(size, fanout=10):
+    """ Builds a serialized tree shaped like the node_list GET payload.
+
+    Args:
+        size (int): Amount of nodes.
+        fanout (int): Children per node that can have children.
+
+    Returns:
+        list: Serialized tree with a single root.
+    """
+    nodes = []
+
+    for pk in range(1, size + 1):
+        min_num, max_num = Node.random_range()
+        parent = nodes[(pk - 2) // fanout] if pk > 1 else None
+        node = {
+            'id':                pk,
+            'name':              f'node-{pk}',
+            'min_num':           min_num,
+            'max_num':           max_num,
+            'parent_id':         parent['id'] if parent else None,
+            'can_have_children': (pk - 1) * fanout + 2 <= size,
+        }
+
+        if node['can_have_children']:
+            node['children'] = []
+
+        if parent is not None:
+            parent['children'].append(node)
+
+        nodes.append(node)
+
+    return nodes[:1]
+
+
+def bench_json(sizes=(100, 1000, 10000, 100000), runs=10):
+    """ Compares the JSON libraries `app.encoders` can use.
+
+    Args:
+        sizes (tuple): Amounts of nodes of the encoded trees.
+        runs (int): Encodes per library and size, the best one is reported.
+
+    Returns:
+        dict: Per tree size, the best encode time in ms and the payload size
+            in bytes of every installed library.
+    """
+    results = {}
+
+    for size in sizes:
+        tree = fake_tree(size)
+        results[size] = {}
+
+        for name, loader in LOADERS.items():
+            try:
+                dumps, _, _ = loader()
+
+            except ImportError:
+                continue
+
+            best = None
+
+            for i in range(runs):
+                start = perf_counter()
+                payload = dumps(tree)
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            results[size][name] = {
+                'dumps_ms': best * 1000,
+                'bytes':    len(payload),
+            }
+
+    return results
@@ -0,0 +1,120 @@
+""" Module coalescing full tree broadcasts of the `update` event. """
+# Modules
+from threading import Lock
+from time import monotonic
+
+# Flask
+from flask import current_app
+
+# Socket
+from app import socketio
+from app.cache import tree_cache
+from app.compression import _compress
+from app.events import FULL_GZIP_ROOM, FULL_ROOM
+from app.metrics import timed_emit
+
+
+class BroadcastScheduler:
+    """ Merges bursts of `update:nodes` requests into a single broadcast.
+
+    Notes:
+        The first request of a burst schedules a broadcast `window` seconds
+        later, requests arriving in the meantime are merged into it. This
+        bounds the delay of a broadcast while serializing the tree once per
+        burst. Clients asking more often than once per `client_interval`
+        seconds are dropped.
+    """
+
+    def __init__(self):
+        """ Creates an idle scheduler with zeroed metrics. """
+        self.metrics = {
+            'requested':  0,
+            'merged':     0,
+            'dropped':    0,
+            'broadcasts': 0,
+        }
+        self._pending = False
+        self._last_request = {}
+        self._lock = Lock()
+
+    def request(self, sid=None):
+        """ Asks for a full tree broadcast on behalf of a client.
+
+        Args:
+            sid (str): Value of requesting client session id, None for
+                requests of the server itself, which aren't rate limited.
+
+        Returns:
+            bool: False if the request was dropped by the rate limit.
+        """
+        config = current_app.config
+        window = config.get('BROADCAST_WINDOW', 0)
+        interval = config.get('BROADCAST_CLIENT_INTERVAL', 0)
+        now = monotonic()
+
+        with self._lock:
+            self.metrics['requested'] += 1
+            last = self._last_request.get(sid)
+
+            if last is not None and now - last < interval:
+                self.metrics['dropped'] += 1
+                return False
+
+            if sid is not None:
+                self._last_request[sid] = now
+
+            if self._pending:
+                self.metrics['merged'] += 1
+                return True
+
+            self._pending = True
+
+        if window > 0:
+            app = current_app._get_current_object()
+            socketio.start_background_task(self._flush, app, window)
+        else:
+            self._broadcast()
+
+        return True
+
+    def forget(self, sid):
+        """ Drops the rate limit state of a disconnected client.
+
+        Args:
+            sid (str): Value of client session id.
+        """
+        with self._lock:
+            self._last_request.pop(sid, None)
+
+    def _flush(self, app, window):
+        """ Waits for the burst window to pass, then broadcasts once.
+
+        Args:
+            app (Flask): Application used to get a context for the DB.
+            window (float): Seconds to wait before broadcasting.
+        """
+        socketio.sleep(window)
+
+        with app.app_context():
+            self._broadcast()
+
+    def _broadcast(self):
+        """ Serializes the tree once and sends it to all full tree clients.
+
+        Notes:
+            Clients of FULL_GZIP_ROOM get the same JSON gzipped as binary,
+            compressed once per tree version. Other workers may hold such
+            clients, so it is compressed even if this worker has none.
+        """
+        # Requests from here on need a new broadcast, this one may already
+        # hold a stale tree for them.
+        with self._lock:
+            self._pending = False
+            self.metrics['broadcasts'] += 1
+
+        payload, _ = tree_cache.get()
+        timed_emit('update', payload.decode('utf-8'), FULL_ROOM)
+        timed_emit('update', _compress(payload, 'gzip', True), FULL_GZIP_ROOM)
+
+
+scheduler = BroadcastScheduler()
@@ -0,0 +1,228 @@
+""" Module holding the process wide caches of the Root tree. """
+# Modules
+from threading import Lock
+
+from sqlalchemy import func
+
+# Utils
+from app.encoders import COLUMNAR, encode
+from app.metrics import timed_serialize
+
+
+class TreeCache:
+    """ Caches the serialized Root tree keyed by the shared tree version.
+
+    Notes:
+        The tree version is the seq of the latest `TreeChange`, recorded by
+        every write path through `app.events.changes`. Checking it is a
+        single index lookup, so each worker notices writes made by the
+        others. Readers rebuild the payload at most once per version per
+        process, afterwards a read is just a memory copy.
+    """
+
+    def __init__(self):
+        """ Creates an empty cache. """
+        # (version, {encoding: payload}) tuple so readers see both in one
+        # attribute read.
+        self._entry = (None, {})
+        self._lock = Lock()
+
+    @staticmethod
+    def current_version(replica=False):
+        """ Returns the current tree version from the DB.
+
+        Args:
+            replica (bool): True to ask a read replica instead of the primary.
+
+        Returns:
+            int: Seq of the latest tree change, 0 if there is none.
+        """
+        from app import db
+        from app.models import TreeChange
+
+        with db.session().replica(replica):
+            return db.session.query(func.max(TreeChange.seq)).scalar() or 0
+
+    @classmethod
+    def replica_caught_up(cls, version):
+        """ Tells whether reads at `version` can go to a read replica.
+
+        Args:
+            version (int): Tree version the read must reflect.
+
+        Returns:
+            bool: True if a replica is configured and has reached `version`.
+        """
+        from app import db
+
+        return bool(db.session().replica_binds) and \
+            cls.current_version(replica=True) >= version
+
+    @staticmethod
+    def etag_for(version, encoding='json'):
+        """ Returns the ETag of a given tree version.
+
+        Args:
+            version (int): Value of tree version.
+            encoding (str): Key of `app.encoders.MEDIA_TYPES`.
+
+        Returns:
+            str: Value of ETag.
+        """
+        if encoding == 'json':
+            return f'tree-{version}'
+
+        return f'tree-{version}-{encoding}'
+
+    def invalidate(self):
+        """ Drops the cached payloads of this process. """
+        with self._lock:
+            self._entry = (None, {})
+
+    def get(self, encoding='json'):
+        """ Returns the serialized Root tree, building it if needed.
+
+        Notes:
+            The version always comes from the primary. The tree is built from
+            the in-memory mirror when enabled, else from a read replica only
+            once the replica has caught up with it, so a payload is never
+            cached under a version it doesn't reflect.
+
+        Args:
+            encoding (str): Key of `app.encoders.MEDIA_TYPES`.
+
+        Returns:
+            tuple: Payload (bytes) and the tree version (int) it holds.
+        """
+        version = self.current_version()
+        cached_version, payloads = self._entry
+
+        if cached_version == version and encoding in payloads:
+            return payloads[encoding], version
+
+        from app import db
+        from app.mirror import mirror
+        from app.tree import load_root_columns, load_root_trees
+
+        with timed_serialize('tree'):
+            if mirror.enabled:
+                if encoding in COLUMNAR:
+                    data = mirror.root_columns(version)
+                else:
+                    data = mirror.root_trees(version)
+
+            else:
+                replica = self.replica_caught_up(version)
+                load = load_root_columns if encoding in COLUMNAR \
+                    else load_root_trees
+
+                with db.session().replica(replica):
+                    data = load()
+
+            payload = encode(encoding, data)
+
+        with self._lock:
+            cached_version, payloads = self._entry
+
+            if cached_version != version:
+                payloads = {}
+
+            self._entry = (version, {**payloads, encoding: payload})
+
+        return payload, version
+
+
+class StatsCache:
+    """ Caches subtree statistics keyed by the shared tree version.
+
+    Notes:
+        Same versioning as `TreeCache`: any write bumps the version, which
+        drops the statistics of every subtree at once, so a cached value is
+        never stale and repeated reads cost only the version lookup.
+    """
+
+    def __init__(self):
+        """ Creates an empty cache. """
+        # (version, {node id: stats}) tuple, see `TreeCache._entry`.
+        self._entry = (None, {})
+        self._lock = Lock()
+
+    def invalidate(self):
+        """ Drops the cached statistics of this process. """
+        with self._lock:
+            self._entry = (None, {})
+
+    def get(self, pk):
+        """ Returns the statistics of a subtree, computing them if needed.
+
+        Args:
+            pk (int): Id of the subtree root.
+
+        Returns:
+            tuple: Value of `app.tree.subtree_stats` (dict, None if the node
+                doesn't exist) and the tree version (int) it holds.
+        """
+        version = tree_cache.current_version()
+        cached_version, entries = self._entry
+
+        if cached_version == version and pk in entries:
+            return entries[pk], version
+
+        from app import db
+        from app.tree import subtree_stats
+
+        with db.session().replica(tree_cache.replica_caught_up(version)):
+            stats = subtree_stats(pk)
+
+        with self._lock:
+            cached_version, entries = self._entry
+
+            if cached_version != version:
+                entries = {}
+
+            self._entry = (version, {**entries, pk: stats})
+
+        return stats, version
+
+
+class RootCache:
+    """ Caches the id of the tree root so hot paths skip the lookup. """
+
+    def __init__(self):
+        """ Creates an empty cache, the root id is resolved on first use. """
+        self._root_id = None
+        self._lock = Lock()
+
+    def get(self):
+        """ Returns the id of the tree root.
+
+        Notes:
+            A missing root isn't cached, so a root created later on (e.g. by
+            `manage.py create_root`) is picked up.
+
+        Returns:
+            int: Id of the root or None if there is none yet.
+        """
+        root_id = self._root_id
+
+        if root_id is None:
+            from app import db
+            from app.models import Node
+
+            root_id = db.session.query(Node.id) \
+                .filter_by(is_root=True).scalar()
+
+            with self._lock:
+                self._root_id = root_id
+
+        return root_id
+
+    def invalidate(self):
+        """ Forgets the root id, it is resolved again on next use. """
+        with self._lock:
+            self._root_id = None
+
+
+tree_cache = TreeCache()
+stats_cache = StatsCache()
+root_cache = RootCache()
@@ -0,0 +1,133 @@
+""" Module compressing large responses with brotli or gzip. """
+# Modules
+import gzip
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+# Flask
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Mimetypes worth compressing, binary formats still repeat node names.
+COMPRESSIBLE = {
+    'application/json',
+    'application/x-ndjson',
+    'application/vnd.nodes.columnar+json',
+    'application/msgpack',
+    'text/plain',
+}
+
+# Amount of compressed bodies kept, see `_compress`.
+MEMO_SIZE = 16
+
+_memo = OrderedDict()
+_memo_lock = Lock()
+
+
+def _encodings():
+    """ Returns the content codings this process can produce.
+
+    Returns:
+        list: Content codings, preferred first.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _compress(body, coding, memoize):
+    """ Compresses a body, reusing the result for an identical body.
+
+    Notes:
+        The cached tree is served unchanged until its version moves, so it
+        is compressed once per version instead of once per request. The
+        memo is keyed by a digest of the body, not the ETag, as responses
+        vary on Accept and an ETag may cover more than one body.
+
+    Args:
+        body (bytes): Response body.
+        coding (str): Value of content coding, 'br' or 'gzip'.
+        memoize (bool): True to use the memo, for bodies likely repeated.
+
+    Returns:
+        bytes: Compressed body.
+    """
+    key = (hashlib.sha1(body).digest(), coding) if memoize else None
+
+    if memoize:
+        with _memo_lock:
+            if key in _memo:
+                _memo.move_to_end(key)
+                return _memo[key]
+
+    config = current_app.config
+
+    if coding == 'br':
+        compressed = brotli.compress(
+            body, quality=config['COMPRESS_BROTLI_QUALITY']
+        )
+    else:
+        compressed = gzip.compress(body, config['COMPRESS_LEVEL'])
+
+    if memoize:
+        with _memo_lock:
+            _memo[key] = compressed
+
+            while len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+
+    return compressed
+
+
+def compress_response(response):
+    """ Compresses a response the client accepts compressed.
+
+    Notes:
+        Registered as an `after_request` hook. Streamed responses, small
+        bodies and mimetypes missing from COMPRESSIBLE are left alone,
+        brotli is preferred over gzip when installed. The coding is added
+        to the ETag, every coding being its own representation, and the
+        request's If-None-Match is checked again against it.
+
+    Args:
+        response (Response): Response of the request.
+
+    Returns:
+        Response: The same response, possibly compressed.
+    """
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed or response.direct_passthrough:
+        return response
+
+    if response.status_code in (204, 304) or \
+            'Content-Encoding' in response.headers or \
+            response.mimetype not in COMPRESSIBLE:
+        return response
+
+    body = response.get_data()
+
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    coding = request.accept_encodings.best_match(_encodings())
+
+    if coding is None:
+        return response
+
+    etag, weak = response.get_etag()
+
+    if etag is not None:
+        response.set_etag(f'{etag}-{coding}', weak)
+        response.make_conditional(request)
+
+        if response.status_code == 304:
+            return response
+
+    # Only bodies with an ETag, i.e. cached payloads, are worth memoizing.
+    response.set_data(_compress(body, coding, etag is not None))
+    response.headers['Content-Encoding'] = coding
+    return response
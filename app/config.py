@@ -11,16 +11,91 @@ class Config:
     TESTING = False
     CSRF_ENABLED = False
     SECRET_KEY = 'flask-session-insecure-secret-key'
-    SQLALCHEMY_DATABASE_URI = environ['DATABASE_URL']
+    # Read when the config is loaded by `create_app`, which fails if unset.
+    SQLALCHEMY_DATABASE_URI = environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Comma separated URLs of read replicas, safe requests read from them.
+    REPLICA_DATABASE_URLS = [
+        url for url in environ.get('REPLICA_DATABASE_URLS', '').split(',')
+        if url
+    ]
+    SQLALCHEMY_BINDS = {
+        f'replica_{index}': url
+        for index, url in enumerate(REPLICA_DATABASE_URLS)
+    }
+    # Seconds a client reads from the primary after writing.
+    REPLICA_STICKY_SECONDS = 5
 
-class ProdConfig(Config):
+    # Test pooled connections before use, see `app.database`.
+    SQLALCHEMY_POOL_PRE_PING = True
+    # Let psycopg2 yield to the eventlet hub (needs psycogreen).
+    PSYCOPG_GREEN = True
+
+    # Maximum amount of children create_sub_nodes generates per request.
+    MAX_SUB_NODES = 15
+    # Maximum amount of operations accepted by the batch endpoint.
+    MAX_BATCH_OPERATIONS = 1000
+    # Rows fetched per round trip when streaming an export.
+    EXPORT_CHUNK_ROWS = 1000
+    # Maximum, and default, amount of matches per search page.
+    SEARCH_MAX_RESULTS = 100
+    # Regeneration jobs run at once per worker, and parents per commit.
+    JOB_WORKERS = 2
+    JOB_CHUNK_SIZE = 50
+
+    # Redis URL (or 'local://' in-process) shared by every worker so
+    # broadcasts reach all clients, required to run more than one worker.
+    SOCKETIO_MESSAGE_QUEUE = environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = 'nodes-server'
+
+    # Seconds a burst of update:nodes requests is merged into one broadcast.
+    BROADCAST_WINDOW = 0.25
+    # Minimum seconds between two update:nodes requests of the same client.
+    BROADCAST_CLIENT_INTERVAL = 0.5
+
+    # JSON library of responses and sockets: 'auto', 'orjson', 'ujson' or
+    # 'json', see `app.encoders`.
+    JSON_BACKEND = environ.get('JSON_BACKEND', 'auto')
+    # Indent JSON responses, compact output is smaller and faster.
+    JSON_PRETTY = False
+
+    # Bodies of at least this many bytes are compressed with brotli / gzip.
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+
+    # Serve tree reads from an in-memory copy, see `app.mirror`.
+    TREE_MIRROR = bool(environ.get('TREE_MIRROR'))
+
+    # Collect the metrics served by /api/nodes/metrics/, see `app.metrics`.
+    METRICS_ENABLED = True
+    # Send each request's timing breakdown in a Server-Timing header.
+    SERVER_TIMING = False
+
+
+class PoolConfig:
+    """ Postgres connection pool settings, overridable from the env.
+
+    Notes:
+        The eventlet worker serves many requests concurrently, each holding a
+        connection while it queries. POOL_SIZE + MAX_OVERFLOW caps how many
+        queries run at once per worker, keep it under the database's
+        connection limit divided by the amount of workers.
+    """
+    SQLALCHEMY_POOL_SIZE = int(environ.get('DB_POOL_SIZE', 10))
+    SQLALCHEMY_MAX_OVERFLOW = int(environ.get('DB_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_TIMEOUT = int(environ.get('DB_POOL_TIMEOUT', 10))
+    SQLALCHEMY_POOL_RECYCLE = int(environ.get('DB_POOL_RECYCLE', 300))
+
+
+class ProdConfig(PoolConfig, Config):
     """ Production settings class, inherits from Config. """
     DEBUG = False
+    JSON_PRETTY = False
 
 
-class StageConfig(Config):
+class StageConfig(PoolConfig, Config):
     """ Staging settings class, inherits from Config. """
     DEBUG = True
     DEVELOPMENT = True
@@ -30,6 +105,8 @@ class DevConfig(Config):
     """ Development settings class, inherits from Config. """
     DEBUG = True
     DEVELOPMENT = True
+    SERVER_TIMING = True
+    JSON_PRETTY = True
     SQLALCHEMY_ECHO = False
 
 
@@ -40,3 +117,4 @@ class TestConfig(Config):
     SQLALCHEMY_ECHO = True
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    BROADCAST_WINDOW = 0
@@ -0,0 +1,225 @@
+""" Module tuning DB connections and routing reads to replicas. """
+# Modules
+import random
+import time
+import warnings
+from contextlib import contextmanager
+from functools import partial
+
+from flask import request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, exc, orm
+from sqlalchemy.pool import Pool
+
+try:
+    from greenlet import getcurrent as _ident_func
+except ImportError:
+    from threading import get_ident as _ident_func
+
+# Prefix of the SQLALCHEMY_BINDS keys pointing at read replicas.
+REPLICA_BIND_PREFIX = 'replica_'
+# Cookie holding until when a client that wrote reads from the primary.
+PRIMARY_COOKIE = 'nodes_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """ Checks a pooled connection is alive before handing it out.
+
+    Notes:
+        Raising DisconnectionError makes the pool drop the connection and
+        retry with a fresh one, so requests don't fail on connections the
+        server closed while they were idle.
+    """
+    cursor = dbapi_connection.cursor()
+
+    try:
+        cursor.execute('SELECT 1')
+
+    except Exception:
+        raise exc.DisconnectionError()
+
+    finally:
+        cursor.close()
+
+
+def _eventlet_patched():
+    """ Checks if eventlet monkey patched the standard library.
+
+    Returns:
+        bool: True when running under the eventlet worker.
+    """
+    try:
+        from eventlet.patcher import is_monkey_patched
+
+    except ImportError:
+        return False
+
+    return is_monkey_patched('socket')
+
+
+def make_psycopg_green():
+    """ Makes psycopg2 yield to the eventlet hub while waiting on queries.
+
+    Notes:
+        psycopg2 is a C extension that eventlet can't monkey patch, without
+        this every query blocks all greenlets of the worker.
+
+    Returns:
+        bool: True if psycopg2 was patched.
+    """
+    try:
+        from psycogreen.eventlet import patch_psycopg
+
+    except ImportError:
+        warnings.warn('psycogreen is not installed, queries will block the '
+                      'eventlet hub.')
+        return False
+
+    patch_psycopg()
+    return True
+
+
+def init_db(app):
+    """ Applies the connection settings of `app` config.
+
+    Args:
+        app (Flask): Application whose config is read.
+    """
+    if app.config.get('SQLALCHEMY_POOL_PRE_PING') and \
+            not event.contains(Pool, 'checkout', _ping_connection):
+        event.listen(Pool, 'checkout', _ping_connection)
+
+    if app.config.get('PSYCOPG_GREEN') and _eventlet_patched():
+        make_psycopg_green()
+
+
+# ------------------------------------------
+#   Read replicas
+# ------------------------------------------
+
+class RoutingSession(SignallingSession):
+    """ Session sending its queries to a read replica when asked to.
+
+    Notes:
+        Sessions use the primary unless `use_replica` is set, flushes always
+        go to the primary. A replica is picked at random once per session so
+        all reads of a request see the same snapshot.
+    """
+
+    def __init__(self, db, **options):
+        """ Creates a session reading from the primary.
+
+        Args:
+            db (SQLAlchemy): Extension the session belongs to.
+        """
+        self.db = db
+        self.use_replica = False
+        self._replica_bind = None
+        super().__init__(db, **options)
+
+    @property
+    def replica_binds(self):
+        """ Returns the bind keys of the configured read replicas.
+
+        Returns:
+            list: SQLALCHEMY_BINDS keys starting with REPLICA_BIND_PREFIX.
+        """
+        binds = self.app.config.get('SQLALCHEMY_BINDS') or {}
+        return sorted(k for k in binds if k.startswith(REPLICA_BIND_PREFIX))
+
+    def get_bind(self, mapper=None, clause=None):
+        """ Returns the replica engine for reads, else the default bind. """
+        if self.use_replica and not self._flushing:
+            if self._replica_bind is None and self.replica_binds:
+                self._replica_bind = random.choice(self.replica_binds)
+
+            if self._replica_bind is not None:
+                return self.db.get_engine(self.app, bind=self._replica_bind)
+
+        return super().get_bind(mapper, clause)
+
+    @contextmanager
+    def replica(self, enabled=True):
+        """ Temporarily reads from a replica, or the primary if not `enabled`.
+
+        Args:
+            enabled (bool): True to read from a replica.
+        """
+        previous = self.use_replica
+        self.use_replica = enabled
+
+        try:
+            yield self
+
+        finally:
+            self.use_replica = previous
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """ SQLAlchemy extension whose sessions are RoutingSessions. """
+
+    def create_scoped_session(self, options=None):
+        """ Creates the scoped session factory backing `db.session`.
+
+        Args:
+            options (dict): Keyword arguments passed to the session.
+
+        Returns:
+            scoped_session: Session registry, one session per greenlet.
+        """
+        options = dict(options or {})
+        scopefunc = options.pop('scopefunc', _ident_func)
+        options.setdefault('query_cls', getattr(self, 'Query', orm.Query))
+        return orm.scoped_session(
+            partial(RoutingSession, self, **options), scopefunc=scopefunc
+        )
+
+
+def route_reads():
+    """ Sends the reads of a safe request to a replica.
+
+    Notes:
+        Registered as a `before_request` hook. Clients that wrote recently
+        carry the PRIMARY_COOKIE and keep reading from the primary, so
+        they see their own writes despite replication lag.
+    """
+    from app import db
+
+    if request.method not in READ_METHODS:
+        return
+
+    try:
+        primary_until = float(request.cookies.get(PRIMARY_COOKIE, 0))
+
+    except ValueError:
+        primary_until = 0
+
+    if primary_until < time.time():
+        db.session().use_replica = True
+
+
+def stick_to_primary(response):
+    """ Makes a client that just wrote read from the primary for a while.
+
+    Notes:
+        Registered as an `after_request` hook, see `route_reads`.
+
+    Args:
+        response (Response): Response of the request.
+
+    Returns:
+        Response: The same response, with PRIMARY_COOKIE on writes.
+    """
+    from flask import current_app
+
+    config = current_app.config
+
+    if request.method not in READ_METHODS and response.status_code < 400 \
+            and config.get('SQLALCHEMY_BINDS'):
+        seconds = config['REPLICA_STICKY_SECONDS']
+        response.set_cookie(
+            PRIMARY_COOKIE, str(time.time() + seconds), max_age=seconds
+        )
+
+    return response
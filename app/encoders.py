@@ -0,0 +1,227 @@
+""" Module selecting the JSON library used for responses and sockets. """
+# Modules
+import json
+import warnings
+
+# Flask
+from flask import Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Libraries tried, in order, when JSON_BACKEND is 'auto'.
+AUTO_BACKENDS = ('orjson', 'ujson', 'json')
+
+# Tree encodings a client can pick with the Accept header, see `negotiate`.
+MEDIA_TYPES = {
+    'json':     'application/json',
+    'columnar': 'application/vnd.nodes.columnar+json',
+    'msgpack':  'application/msgpack',
+}
+# Encodings holding the parallel arrays of `app.tree.rows_to_columns`.
+COLUMNAR = ('columnar', 'msgpack')
+
+
+def _orjson():
+    """ Returns the compact, pretty and loads functions of orjson. """
+    import orjson
+
+    def dumps(data):
+        return orjson.dumps(data)
+
+    def dumps_pretty(data):
+        return orjson.dumps(
+            data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        )
+
+    return dumps, dumps_pretty, orjson.loads
+
+
+def _ujson():
+    """ Returns the compact, pretty and loads functions of ujson. """
+    import ujson
+
+    def dumps(data):
+        return ujson.dumps(data, escape_forward_slashes=False) \
+            .encode('utf-8')
+
+    def dumps_pretty(data):
+        return ujson.dumps(
+            data, escape_forward_slashes=False, indent=2, sort_keys=True
+        ).encode('utf-8')
+
+    return dumps, dumps_pretty, ujson.loads
+
+
+def _json():
+    """ Returns the compact, pretty and loads functions of the stdlib. """
+    def dumps(data):
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    def dumps_pretty(data):
+        return json.dumps(data, indent=2, sort_keys=True).encode('utf-8')
+
+    return dumps, dumps_pretty, json.loads
+
+
+LOADERS = {
+    'orjson': _orjson,
+    'ujson':  _ujson,
+    'json':   _json,
+}
+
+
+class JSONBackend:
+    """ JSON library shared by the blueprint, caches and Socket.IO.
+
+    Notes:
+        Exposes `dumps` / `loads` compatible with the stdlib module, so the
+        instance can be handed to `SocketIO(json=...)`, and `dumps_bytes`
+        for responses, which skips decoding the bytes orjson produces.
+        Until `init_app` runs the stdlib is used.
+    """
+
+    def __init__(self):
+        """ Creates a backend using the stdlib json module. """
+        self.pretty = False
+        self._use('json')
+
+    def _use(self, name):
+        """ Switches to the library `name`.
+
+        Args:
+            name (str): Key of LOADERS.
+        """
+        self.name = name
+        self._dumps, self._dumps_pretty, self._loads = LOADERS[name]()
+
+    def init_app(self, app):
+        """ Picks the library set by `app` config.
+
+        Notes:
+            JSON_BACKEND is 'auto' or a key of LOADERS, a library that isn't
+            installed falls back to the stdlib with a warning.
+
+        Args:
+            app (Flask): Application whose config is read.
+        """
+        choice = app.config.get('JSON_BACKEND', 'auto')
+        names = AUTO_BACKENDS if choice == 'auto' else (choice, 'json')
+
+        for name in names:
+            try:
+                self._use(name)
+
+            except (ImportError, KeyError):
+                if choice != 'auto':
+                    warnings.warn(f'JSON backend {choice} is not available, '
+                                  'using json.')
+                continue
+
+            break
+
+        self.pretty = app.config.get('JSON_PRETTY', False)
+
+    def dumps_bytes(self, data, pretty=None):
+        """ Encodes `data` as UTF-8 JSON.
+
+        Args:
+            data (object): Value to encode.
+            pretty (bool): True to indent, None to follow JSON_PRETTY.
+
+        Returns:
+            bytes: Encoded JSON.
+        """
+        if pretty is None:
+            pretty = self.pretty
+
+        if pretty:
+            return self._dumps_pretty(data)
+
+        return self._dumps(data)
+
+    def dumps(self, data, **kwargs):
+        """ Encodes `data` as compact JSON text.
+
+        Notes:
+            Keyword arguments of `json.dumps` such as `separators` are
+            accepted for compatibility and ignored.
+
+        Args:
+            data (object): Value to encode.
+
+        Returns:
+            str: Encoded JSON.
+        """
+        return self._dumps(data).decode('utf-8')
+
+    def loads(self, text, **kwargs):
+        """ Decodes JSON text or bytes.
+
+        Args:
+            text (str | bytes): JSON to decode.
+
+        Returns:
+            object: Decoded value.
+        """
+        return self._loads(text)
+
+
+json_backend = JSONBackend()
+
+
+def jsonify(data):
+    """ Drop in replacement of `flask.jsonify` using `json_backend`.
+
+    Args:
+        data (object): Value to encode.
+
+    Returns:
+        (Response): JSON response.
+    """
+    return Response(
+        json_backend.dumps_bytes(data), mimetype='application/json'
+    )
+
+
+def negotiate(accept_mimetypes):
+    """ Picks the tree encoding the client prefers.
+
+    Notes:
+        Nested JSON wins ties, so clients not asking for anything in
+        particular keep getting it. msgpack is only offered when installed.
+
+    Args:
+        accept_mimetypes (MIMEAccept): Parsed Accept header of the request.
+
+    Returns:
+        str: Key of MEDIA_TYPES.
+    """
+    offers = [
+        media_type for encoding, media_type in MEDIA_TYPES.items()
+        if encoding != 'msgpack' or msgpack is not None
+    ]
+    best = accept_mimetypes.best_match(offers, MEDIA_TYPES['json'])
+
+    return next(
+        encoding for encoding, media_type in MEDIA_TYPES.items()
+        if media_type == best
+    )
+
+
+def encode(encoding, data):
+    """ Encodes tree data in a negotiated encoding, always compact.
+
+    Args:
+        encoding (str): Key of MEDIA_TYPES.
+        data (object): Nested trees, or columns for COLUMNAR encodings.
+
+    Returns:
+        bytes: Encoded payload.
+    """
+    if encoding == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+
+    return json_backend.dumps_bytes(data, pretty=False)
@@ -0,0 +1,189 @@
+""" Module publishing tree changes as sequenced Socket.IO deltas.
+
+Protocol:
+    - Clients emit `subscribe:nodes` with `{'seq': <last seen seq or null>}`
+      to stop receiving full `update` broadcasts and start receiving `delta`
+      events instead.
+    - Every write publishes one `delta` event `{'seq': int, 'type': str, ...}`
+      where `seq` is the tree version and normally increases by one.
+    - A client that sees a gap in `seq` emits `sync:nodes` with its last
+      seen seq and receives either the missed `deltas` or a full `snapshot`
+      `{'seq': int, 'nodes': str}`. Deltas with a seq lower or equal to the
+      snapshot seq must be ignored.
+    - `subtree:regenerated` `{'root_id': int, ...}` is published once by a
+      bulk regeneration job, clients refetch the subtree of `root_id`.
+"""
+# Modules
+from threading import Lock
+
+from sqlalchemy import text
+
+# Socket
+from app import db
+from app.cache import tree_cache
+from app.encoders import json_backend
+from app.metrics import timed_emit
+from app.models import TreeChange
+
+# Rooms separating legacy full tree clients from delta subscribers.
+FULL_ROOM = 'nodes:full'
+# Full tree clients that asked for gzip compressed `update` payloads.
+FULL_GZIP_ROOM = 'nodes:full:gzip'
+DELTA_ROOM = 'nodes:deltas'
+
+# Event types.
+NODE_ADDED = 'node:added'
+NODE_UPDATED = 'node:updated'
+NODE_DELETED = 'node:deleted'
+CHILDREN_REGENERATED = 'children:regenerated'
+SUBTREE_REGENERATED = 'subtree:regenerated'
+NODE_MOVED = 'node:moved'
+
+# Postgres advisory lock making writers commit in seq order, see
+# `ChangeFeed.publish_many`.
+SEQ_LOCK_KEY = 0x6e6f6465
+
+
+class ChangeFeed:
+    """ Sequences tree changes through the `tree_change` table.
+
+    Notes:
+        The table is shared by every worker, so seq numbers are global and
+        any worker can replay what a client missed. Events of different
+        workers may reach a client out of order, which it handles like any
+        other gap.
+    """
+
+    def __init__(self, cache, backlog=1000):
+        """ Creates a new feed.
+
+        Args:
+            cache (TreeCache): Cache dropped whenever a change is published.
+            backlog (int): Amount of recent changes kept for `since`.
+        """
+        self.cache = cache
+        self.backlog = backlog
+        # Callables receiving the events this process publishes.
+        self.listeners = []
+        self._lock = Lock()
+
+    def publish(self, kind, **data):
+        """ Commits a change and broadcasts it as a delta event.
+
+        Args:
+            kind (str): Value of event type.
+            **data: Event specific payload.
+
+        Returns:
+            dict: Value of published event.
+        """
+        return self.publish_many([(kind, data)])[0]
+
+    def publish_many(self, changes):
+        """ Commits changes with the caller's writes, then broadcasts them.
+
+        Notes:
+            Must be called instead of committing: the `tree_change` rows
+            join the caller's open transaction, so the data and the tree
+            version move together or not at all. On Postgres an advisory
+            lock held from the seq allocation to the commit makes writers
+            commit in seq order, so a reader seeing version N also sees
+            every change up to N. The process lock keeps events of this
+            process leaving in seq order.
+
+        Args:
+            changes (list): Event type and payload dict pairs.
+
+        Returns:
+            list: Values of published events.
+        """
+        rows = [
+            TreeChange(kind=kind, payload=json_backend.dumps(data))
+            for kind, data in changes
+        ]
+
+        if not rows:
+            return []
+
+        with self._lock:
+            session = db.session()
+
+            if session.get_bind().dialect.name == 'postgresql':
+                session.execute(
+                    text('SELECT pg_advisory_xact_lock(:key)'),
+                    {'key': SEQ_LOCK_KEY}
+                )
+
+            try:
+                session.add_all(rows)
+                session.flush()
+                events = [row.event for row in rows]
+                session.commit()
+
+            except Exception:
+                session.rollback()
+                raise
+
+            self.cache.invalidate()
+
+            for listener in self.listeners:
+                listener(events)
+
+            for event in events:
+                timed_emit('delta', event, DELTA_ROOM)
+
+        self._prune(events[0]['seq'], events[-1]['seq'])
+        return events
+
+    def since(self, seq):
+        """ Returns the events published after `seq`.
+
+        Args:
+            seq (int): Value of last seq seen by the client.
+
+        Returns:
+            list: Events after `seq` or None if the backlog doesn't reach back
+                far enough and the client needs a snapshot.
+        """
+        current = self.cache.current_version()
+
+        if seq == current:
+            return []
+
+        if not isinstance(seq, int) or not 0 <= current - seq <= self.backlog:
+            return None
+
+        missed = [
+            row.event for row in
+            TreeChange.query.filter(TreeChange.seq > seq)
+            .order_by(TreeChange.seq)
+        ]
+
+        # Sequence gaps (rolled back or pruned changes) need a snapshot.
+        if [event['seq'] for event in missed] != \
+                list(range(seq + 1, seq + 1 + len(missed))):
+            return None
+
+        return missed
+
+    def _prune(self, first_seq, seq):
+        """ Deletes changes that fell out of the backlog every so often.
+
+        Notes:
+            Runs when the published seqs cross a multiple of the backlog.
+            Batches and other workers' changes make landing exactly on one
+            unlikely.
+
+        Args:
+            first_seq (int): Value of the first seq just published.
+            seq (int): Value of the latest published seq.
+        """
+        if (first_seq - 1) // self.backlog == seq // self.backlog:
+            return
+
+        TreeChange.query.filter(TreeChange.seq <= seq - self.backlog) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+changes = ChangeFeed(tree_cache)
@@ -8,3 +8,27 @@ class ObjectDoesntExist(Exception):
             message (str): Value of error message. 
         """
         self.message = message
+
+
+class ValidationError(Exception):
+    """ Exception for when incoming Node data breaks a rule. """
+
+    def __init__(self, message):
+        """ Sets the error message to 'message' attr.
+
+        Args:
+            message (str): Value of error message.
+        """
+        self.message = message
+
+
+class PreconditionFailed(Exception):
+    """ Exception for when a request's If-Match doesn't hold anymore. """
+
+    def __init__(self, message):
+        """ Sets the error message to 'message' attr.
+
+        Args:
+            message (str): Value of error message.
+        """
+        self.message = message
@@ -0,0 +1,85 @@
+""" Module streaming the node tree as JSON or NDJSON chunks. """
+# Utils
+from app.encoders import json_backend
+from app.tree import iter_subtree_rows, row_to_dict
+
+
+def _dumps(data):
+    """ Returns compact JSON of `data`.
+
+    Args:
+        data (object): Value to encode.
+
+    Returns:
+        str: JSON text without whitespace.
+    """
+    return json_backend.dumps(data)
+
+
+def iter_json(root_ids, chunk_size=1000):
+    """ Streams the nested trees of `root_ids` as a JSON list.
+
+    Notes:
+        Produces the nodes and nesting of node_list GET without ever holding
+        more than `chunk_size` rows, though siblings come in path order
+        rather than by id. Open nodes are kept on a stack and closed once a
+        row of the same or lower depth shows up.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+        chunk_size (int): Amount of rows fetched and yielded at once.
+
+    Yields:
+        str: Chunks of the JSON document.
+    """
+    yield '['
+    # Depths of the nodes whose children list is still open.
+    stack = []
+    need_comma = False
+
+    for rows in iter_subtree_rows(root_ids, chunk_size):
+        parts = []
+
+        for row in rows:
+            depth = row.path.count('/')
+
+            while stack and stack[-1] >= depth:
+                stack.pop()
+                parts.append(']}')
+                need_comma = True
+
+            if need_comma:
+                parts.append(',')
+
+            # Drop the closing brace, children may follow.
+            parts.append(_dumps(row_to_dict(row))[:-1])
+
+            if row.can_have_children:
+                parts.append(',"children":[')
+                stack.append(depth)
+                need_comma = False
+            else:
+                parts.append('}')
+                need_comma = True
+
+        yield ''.join(parts)
+
+    yield ']}' * len(stack) + ']'
+
+
+def iter_ndjson(root_ids, chunk_size=1000):
+    """ Streams the nodes of `root_ids` subtrees one JSON object per line.
+
+    Notes:
+        Nodes keep their `parent_id` and parents always come before their
+        children, so clients can rebuild the tree while reading.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+        chunk_size (int): Amount of rows fetched and yielded at once.
+
+    Yields:
+        str: Chunks of newline delimited JSON.
+    """
+    for rows in iter_subtree_rows(root_ids, chunk_size):
+        yield ''.join(_dumps(row_to_dict(row)) + '\n' for row in rows)
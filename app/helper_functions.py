@@ -1,4 +1,6 @@
-from app.exceptions import ObjectDoesntExist
+from app.exceptions import (
+    ObjectDoesntExist, PreconditionFailed, ValidationError
+)
 
 
 def get_object(model, pk):
@@ -14,3 +16,224 @@ def get_object(model, pk):
         raise ObjectDoesntExist(f"Node with id {pk} doesn't exist")
     else:
         return instance
+
+
+def version_tag(node):
+    """ Returns the entity tag If-Match compares with a Node's version.
+
+        Notes:
+            Sent as the X-Node-Version header rather than as ETag, responses
+            hold the whole subtree which changes without this row.
+
+        Args:
+            node (Node): Node to tag.
+
+        Returns:
+            str: Value of the Node version.
+    """
+    return str(node.version)
+
+
+def check_if_match(node, if_match):
+    """ Checks a request's If-Match header against the Node version.
+
+        Notes:
+            Requests without If-Match always pass, others must send the
+            quoted value of X-Node-Version, e.g. `If-Match: "3"`.
+
+        Args:
+            node (Node): Node the request writes.
+            if_match (ETags): Parsed If-Match header of the request.
+
+        Raises:
+            PreconditionFailed: If no ETag matches the current version.
+    """
+    if if_match and not if_match.contains(version_tag(node)):
+        raise PreconditionFailed(
+            f'Node with id {node.id} was modified, '
+            f'its current version is {node.version}'
+        )
+
+
+def validate_name(name):
+    """ Checks a name can be used for a new Node.
+
+        Args:
+            name (str): Value of the requested name.
+
+        Raises:
+            ValidationError: If the name is too short or not a string.
+    """
+    if not (name and isinstance(name, str) and len(name) >= 5):
+        raise ValidationError('Name must be minimum of 5 Alpha characters')
+
+
+def validate_update(node, data):
+    """ Checks incoming update data against the Node rules.
+
+        Notes:
+            Nothing is assigned on `node`, so a rejected update can't leak
+            into a later commit. An invalid name is ignored, invalid numbers
+            and a name another Node that can have children already uses
+            reject the whole update. The unique `uq_node_name` index still
+            backs the name check against concurrent renames.
+
+        Args:
+            node (Node): Node that is going to be updated.
+            data (dict): Incoming name, min_num and max_num values.
+
+        Returns:
+            dict: Attributes to set on `node`.
+
+        Raises:
+            ValidationError: If min_num, max_num or the name break a rule.
+    """
+    name = data.get('name')
+    min_num = data.get('min_num')
+    max_num = data.get('max_num')
+    changes = {}
+
+    # Make sure data is of appropriate type.
+    if isinstance(name, str) and node.name != name and len(name) >= 5:
+        model = type(node)
+
+        if node.can_have_children and model.query.filter(
+                model.name == name, model.can_have_children,
+                model.id != node.id).first():
+            raise ValidationError(f'Node with name {name} already exists')
+
+        changes['name'] = name
+
+    # Checks if min and max are integers.
+    if not (isinstance(min_num, int) and isinstance(max_num, int)):
+        raise ValidationError('min_num and max_num must be integers')
+
+    # Checks if numbers are within bounds.
+    if not (0 <= min_num <= 970 and 1 <= max_num <= 1000):
+        raise ValidationError('min_num and or max_num are out of bounds.')
+
+    # Checks if min is less than max.
+    if min_num >= max_num:
+        raise ValidationError('min_num must be less tha max_num')
+
+    changes['min_num'] = min_num
+    changes['max_num'] = max_num
+    return changes
+
+
+def parse_tree_args(args):
+    """ Parses the optional depth, limit and after query parameters.
+
+        Args:
+            args (MultiDict): Request query parameters.
+
+        Returns:
+            dict: Parsed values, empty if none of them were sent.
+
+        Raises:
+            ValidationError: If a value isn't a non negative integer or limit
+                is 0.
+    """
+    parsed = {}
+
+    for key in ('depth', 'limit', 'after'):
+        value = args.get(key)
+
+        if value is None:
+            continue
+
+        if not value.isdigit():
+            raise ValidationError(f'{key} must be a positive integer')
+
+        parsed[key] = int(value)
+
+    if parsed.get('limit') == 0:
+        raise ValidationError('limit must be a positive integer')
+
+    return parsed
+
+
+def parse_search_args(args, max_results):
+    """ Parses the query parameters of the search endpoint.
+
+        Notes:
+            `contains=N` is a shorthand for `min_num=N&max_num=N`, matching
+            the ranges that include N. `min_num` / `max_num` match ranges
+            overlapping them.
+
+        Args:
+            args (MultiDict): Request query parameters.
+            max_results (int): Highest accepted limit, also the default.
+
+        Returns:
+            dict: Keyword arguments for `app.tree.search_nodes`.
+
+        Raises:
+            ValidationError: If a value is invalid or no filter was sent.
+    """
+    parsed = {}
+    name = args.get('name')
+
+    if name is not None:
+        match = args.get('match', 'prefix')
+
+        if not name:
+            raise ValidationError('name must not be empty')
+
+        if match not in ('prefix', 'contains'):
+            raise ValidationError("match must be 'prefix' or 'contains'")
+
+        parsed.update(name=name, match=match)
+
+    for key in ('contains', 'min_num', 'max_num', 'root', 'limit', 'after'):
+        value = args.get(key)
+
+        if value is None:
+            continue
+
+        if not value.isdigit():
+            raise ValidationError(f'{key} must be a positive integer')
+
+        parsed[key] = int(value)
+
+    if 'contains' in parsed:
+        if 'min_num' in parsed or 'max_num' in parsed:
+            raise ValidationError(
+                "contains can't be combined with min_num or max_num"
+            )
+
+        parsed['min_num'] = parsed['max_num'] = parsed.pop('contains')
+
+    if not {'name', 'min_num', 'max_num'} & set(parsed):
+        raise ValidationError('Must send name, contains, min_num or max_num')
+
+    parsed.setdefault('limit', max_results)
+
+    if not 1 <= parsed['limit'] <= max_results:
+        raise ValidationError(f'limit must be between 1-{max_results}')
+
+    return parsed
+
+
+def validate_move(node, parent):
+    """ Checks `node` can be moved below `parent`.
+
+        Notes:
+            A cycle is detected from the paths alone, `parent` can't be the
+            node itself or one of its descendants.
+
+        Args:
+            node (Node): Node that is going to be moved.
+            parent (Node): Requested new parent.
+
+        Raises:
+            ValidationError: If the move breaks a rule.
+    """
+    if node.is_root:
+        raise ValidationError("Can't move the Root node.")
+
+    if not parent.can_have_children:
+        raise ValidationError(f"Node with id {parent.id} can't have children")
+
+    if parent.path.startswith(node.path):
+        raise ValidationError("Can't move a node below itself.")
@@ -0,0 +1,204 @@
+""" Module running bulk children regeneration as background jobs. """
+# Modules
+from datetime import datetime
+from threading import Semaphore
+
+from flask import current_app
+from sqlalchemy import select
+
+# db
+from app import db, socketio
+from app.models import Node, RegenerationJob
+
+# Utils
+from app import events
+from app.broadcast import scheduler
+from app.events import changes
+from app.metrics import timed_emit
+from app.tree import path_order
+
+# Room of the clients following job progress.
+JOBS_ROOM = 'jobs'
+
+
+def regeneration_targets(root):
+    """ Returns the nodes a job regenerates the children of.
+
+    Notes:
+        Every node of the subtree that can have children except the tree
+        Root, whose children are the factories. Nodes below another target
+        are skipped, regenerating the target replaces them anyway.
+
+    Args:
+        root (Node): Root of the regenerated subtree.
+
+    Returns:
+        list: Node ids ordered by path.
+    """
+    table = Node.__table__
+    rows = db.session.execute(
+        select([table.c.id, table.c.path])
+        .where(table.c.path.like(root.path + '%'))
+        .where(table.c.can_have_children)
+        .where(~table.c.is_root)
+        .order_by(path_order(table))
+    )
+    targets = []
+    last_path = None
+
+    # In byte order of path, descendants come right after their ancestor.
+    for pk, path in rows:
+        if last_path is None or not path.startswith(last_path):
+            targets.append(pk)
+            last_path = path
+
+    return targets
+
+
+class JobRunner:
+    """ Runs regeneration jobs in background tasks.
+
+    Notes:
+        At most JOB_WORKERS jobs run at once per process, others wait for a
+        slot. Each job commits JOB_CHUNK_SIZE parents at a time so locks are
+        held briefly and progress is visible, then publishes one change and
+        one full tree broadcast once done.
+    """
+
+    def __init__(self):
+        """ Creates a runner with a single slot until `init_app`. """
+        self._slots = Semaphore(1)
+
+    def init_app(self, app):
+        """ Sizes the worker pool from `app` config.
+
+        Args:
+            app (Flask): Application whose config is read.
+        """
+        self._slots = Semaphore(app.config['JOB_WORKERS'])
+
+    def submit(self, app, root, count):
+        """ Records a job and schedules it.
+
+        Args:
+            app (Flask): Application the job runs in.
+            root (Node): Root of the subtree to regenerate.
+            count (int): Amount of children per regenerated node.
+
+        Returns:
+            RegenerationJob: The queued job.
+        """
+        job = RegenerationJob(root_id=root.id, count=count)
+        db.session.add(job)
+        db.session.commit()
+        socketio.start_background_task(self._run, app, job.id)
+        return job
+
+    def _run(self, app, job_id):
+        """ Runs a job once a slot is free.
+
+        Args:
+            app (Flask): Application used to get a context for the DB.
+            job_id (int): Id of the job.
+        """
+        with self._slots, app.app_context():
+            try:
+                self._regenerate(RegenerationJob.query.get(job_id))
+
+            except Exception as error:
+                app.logger.exception(f'Regeneration job {job_id} failed')
+                db.session.rollback()
+                job = RegenerationJob.query.get(job_id)
+
+                # Chunks committed before the failure still changed the tree.
+                if job.done:
+                    self._publish(job)
+
+                self._finish(job, RegenerationJob.FAILED, str(error))
+
+            finally:
+                db.session.remove()
+
+    def _regenerate(self, job):
+        """ Regenerates the children of every target, chunk by chunk.
+
+        Args:
+            job (RegenerationJob): Job to run.
+        """
+        root = Node.query.get(job.root_id)
+
+        if root is None:
+            msg = f"Node with id {job.root_id} doesn't exist"
+            self._finish(job, RegenerationJob.FAILED, msg)
+            return
+
+        targets = regeneration_targets(root)
+        job.status = RegenerationJob.RUNNING
+        job.total = len(targets)
+        db.session.commit()
+        self._progress(job)
+
+        chunk_size = current_app.config['JOB_CHUNK_SIZE']
+
+        for start in range(0, len(targets), chunk_size):
+            chunk = targets[start:start + chunk_size]
+
+            # Nodes deleted since the job started are skipped.
+            for parent in Node.query.filter(Node.id.in_(chunk)):
+                Node.regenerate_children(parent, job.count)
+
+            job.done += len(chunk)
+
+            # The last chunk is committed with the change event.
+            if start + chunk_size >= len(targets):
+                break
+
+            db.session.commit()
+            self._progress(job)
+
+        self._publish(job)
+        self._finish(job, RegenerationJob.DONE)
+
+    @staticmethod
+    def _publish(job):
+        """ Announces the regenerated subtree once, however many chunks.
+
+        Notes:
+            Commits whatever the session holds, e.g. the last chunk.
+
+        Args:
+            job (RegenerationJob): Job that changed the tree.
+        """
+        changes.publish(
+            events.SUBTREE_REGENERATED,
+            root_id=job.root_id,
+            count=job.count,
+            parents=job.done
+        )
+        scheduler.request()
+
+    def _finish(self, job, status, error=None):
+        """ Records the outcome of a job.
+
+        Args:
+            job (RegenerationJob): Finished job.
+            status (str): Value of final status.
+            error (str): Value of failure reason.
+        """
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        self._progress(job)
+
+    @staticmethod
+    def _progress(job):
+        """ Pushes the state of a job to the clients following jobs.
+
+        Args:
+            job (RegenerationJob): Job to report.
+        """
+        timed_emit('job:progress', job.serialize, JOBS_ROOM)
+
+
+runner = JobRunner()
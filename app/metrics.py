@@ -0,0 +1,297 @@
+""" Module collecting request, SQL, serialization and emit metrics. """
+# Modules
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+# Flask
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds of the buckets, in seconds or amounts.
+TIME_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+
+class Histogram:
+    """ Prometheus style histogram with one series per label set.
+
+    Notes:
+        Counts are kept per bucket and summed when rendered, so observing a
+        value is a bisect and an increment under a lock.
+    """
+
+    def __init__(self, name, help_text, labels=(), buckets=TIME_BUCKETS):
+        """ Creates an empty histogram.
+
+        Args:
+            name (str): Value of metric name.
+            help_text (str): Description shown by Prometheus.
+            labels (tuple): Names of the labels of every series.
+            buckets (tuple): Sorted upper bounds of the buckets.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = defaultdict(
+            lambda: {'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+        )
+        self._lock = Lock()
+
+    def observe(self, value, **labels):
+        """ Records a value.
+
+        Args:
+            value (float): Value observed.
+            **labels: Values of the labels of the series.
+        """
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series[key]
+            series['counts'][index] += 1
+            series['sum'] += value
+
+    def render(self):
+        """ Returns the histogram in the Prometheus text format.
+
+        Returns:
+            list: Lines of the exposition.
+        """
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+
+        with self._lock:
+            series = {
+                key: (list(data['counts']), data['sum'])
+                for key, data in self._series.items()
+            }
+
+        for key, (counts, total) in sorted(series.items()):
+            pairs = [f'{k}="{v}"' for k, v in zip(self.labels, key)]
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = ','.join(pairs + [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{{{labels}}} {cumulative}')
+
+            labels = '{' + ','.join(pairs) + '}' if pairs else ''
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+
+        return lines
+
+
+request_seconds = Histogram(
+    'nodes_request_seconds', 'Latency of node_app requests.',
+    labels=('endpoint', 'method')
+)
+sql_statements = Histogram(
+    'nodes_request_sql_statements', 'SQL statements run per request.',
+    labels=('endpoint', 'method'), buckets=COUNT_BUCKETS
+)
+sql_seconds = Histogram(
+    'nodes_request_sql_seconds', 'Time spent in SQL per request.',
+    labels=('endpoint', 'method')
+)
+serialize_seconds = Histogram(
+    'nodes_serialize_seconds', 'Time spent serializing trees.',
+    labels=('kind',)
+)
+emit_recipients = Histogram(
+    'nodes_emit_recipients', 'Clients of this worker reached per emit.',
+    labels=('event',), buckets=COUNT_BUCKETS
+)
+emit_seconds = Histogram(
+    'nodes_emit_seconds', 'Time spent emitting Socket.IO events.',
+    labels=('event',)
+)
+
+HISTOGRAMS = (
+    request_seconds, sql_statements, sql_seconds,
+    serialize_seconds, emit_recipients, emit_seconds,
+)
+
+
+# ------------------------------------------
+#   SQL
+# ------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    """ Remembers when a statement started. """
+    conn.info.setdefault('query_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    """ Adds a finished statement to the stats of the current request. """
+    started = conn.info['query_start'].pop()
+
+    if has_app_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += perf_counter() - started
+
+
+def init_metrics(app):
+    """ Starts counting the SQL statements of every engine.
+
+    Args:
+        app (Flask): Application whose config is read.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+# ------------------------------------------
+#   Requests
+# ------------------------------------------
+
+def start_request():
+    """ Starts timing a request, registered as a `before_request` hook. """
+    if not current_app.config.get('METRICS_ENABLED'):
+        return
+
+    g.request_started = perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    g.timings = defaultdict(float)
+
+
+def finish_request(response):
+    """ Records the metrics of a request, registered as `after_request`.
+
+    Notes:
+        With SERVER_TIMING enabled the breakdown is also sent back in a
+        `Server-Timing` header, which browser dev tools display. Streamed
+        responses are timed up to the first chunk.
+
+    Args:
+        response (Response): Response of the request.
+
+    Returns:
+        Response: The same response.
+    """
+    if 'request_started' not in g:
+        return response
+
+    total = perf_counter() - g.request_started
+    labels = {'endpoint': request.endpoint, 'method': request.method}
+    request_seconds.observe(total, **labels)
+    sql_statements.observe(g.sql_statements, **labels)
+    sql_seconds.observe(g.sql_seconds, **labels)
+
+    if current_app.config.get('SERVER_TIMING'):
+        timings = [
+            f'db;dur={g.sql_seconds * 1000:.2f};'
+            f'desc="{g.sql_statements} queries"'
+        ]
+        timings.extend(
+            f'{name};dur={seconds * 1000:.2f}'
+            for name, seconds in g.timings.items()
+        )
+        timings.append(f'total;dur={total * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+    return response
+
+
+@contextmanager
+def timed_serialize(kind):
+    """ Times a serialization, adding it to the current request timings.
+
+    Args:
+        kind (str): Value of what is serialized, e.g. 'node' or 'tree'.
+    """
+    started = perf_counter()
+
+    try:
+        yield
+
+    finally:
+        seconds = perf_counter() - started
+        serialize_seconds.observe(seconds, kind=kind)
+
+        if has_app_context() and 'timings' in g:
+            g.timings[f'serialize-{kind}'] += seconds
+
+
+# ------------------------------------------
+#   Socket.IO
+# ------------------------------------------
+
+def room_size(room, namespace='/'):
+    """ Returns the amount of clients of this worker in a room.
+
+    Args:
+        room (str): Value of room name.
+        namespace (str): Value of Socket.IO namespace.
+
+    Returns:
+        int: Amount of local clients in the room.
+    """
+    from app import socketio
+
+    rooms = socketio.server.manager.rooms.get(namespace, {})
+    return len(rooms.get(room) or ())
+
+
+def timed_emit(event_name, data, room):
+    """ Emits an event to a room, recording its fan-out and duration.
+
+    Notes:
+        With a message queue the recipients counted are the clients of this
+        worker, every worker records its own share.
+
+    Args:
+        event_name (str): Value of Socket.IO event.
+        data: Event payload.
+        room (str): Value of room to emit to.
+    """
+    from app import socketio
+
+    started = perf_counter()
+    socketio.emit(event_name, data, room=room)
+    emit_seconds.observe(perf_counter() - started, event=event_name)
+    emit_recipients.observe(room_size(room), event=event_name)
+
+
+# ------------------------------------------
+#   Exposition
+# ------------------------------------------
+
+def render_metrics():
+    """ Returns every metric in the Prometheus text format.
+
+    Returns:
+        str: Value of the exposition.
+    """
+    from app.broadcast import scheduler
+
+    lines = []
+
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    for key, value in sorted(scheduler.metrics.items()):
+        name = f'nodes_broadcast_{key}_total'
+        lines.append(f'# HELP {name} Broadcast scheduler {key} count.')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,395 @@
+""" Module keeping a process local copy of the tree for read traffic. """
+# Modules
+from bisect import insort
+from threading import RLock
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+# db
+from app import db
+from app.cache import root_cache, tree_cache
+from app.models import Node
+
+# Utils
+from app import events
+from app.events import changes
+from app.tree import _columns, fetch_subtree_rows
+
+
+class MirrorNode:
+    """ Compact record of a Node, its children are kept as sorted ids. """
+
+    __slots__ = (
+        'id', 'parent_id', 'name', 'min_num', 'max_num', 'can_have_children',
+        'children',
+    )
+
+    def __init__(self, data):
+        """ Creates a record without children.
+
+        Args:
+            data (dict | RowProxy): Flat Node data, see `serialize_flat`.
+        """
+        self.children = []
+        self.update(data)
+
+    def update(self, data):
+        """ Copies the flat attributes of `data`, children are kept.
+
+        Args:
+            data (dict | RowProxy): Flat Node data.
+        """
+        get = data.get if isinstance(data, dict) else data.__getitem__
+        self.id = get('id')
+        self.parent_id = get('parent_id')
+        self.name = get('name')
+        self.min_num = get('min_num')
+        self.max_num = get('max_num')
+        self.can_have_children = get('can_have_children')
+
+    def serialize_flat(self):
+        """ Returns the same dict as `Node.serialize_flat`.
+
+        Returns:
+            dict: Key value pairs of essential Node data.
+        """
+        return {
+            'id':                self.id,
+            'name':              self.name,
+            'min_num':           self.min_num,
+            'max_num':           self.max_num,
+            'parent_id':         self.parent_id,
+            'can_have_children': self.can_have_children
+        }
+
+
+class TreeMirror:
+    """ Serves tree reads from memory, kept current by the change feed.
+
+    Notes:
+        Loaded from the DB when the app starts. Changes published by this
+        process are applied as they happen, changes of other workers are
+        replayed from `tree_change` when the DB version counter is ahead of
+        the mirror. Gaps the backlog can't fill and unknown event types trigger
+        a full reload. Reads still cost the version lookup, which is what
+        keeps workers consistent.
+    """
+
+    def __init__(self):
+        """ Creates a disabled, empty mirror. """
+        self.enabled = False
+        self.version = None
+        self._nodes = {}
+        self._lock = RLock()
+
+    def init_app(self, app):
+        """ Enables and loads the mirror if TREE_MIRROR is set in `app` config.
+
+        Notes:
+            Loading here spares the first request the full table scan. If
+            the tables don't exist yet, e.g. while running migrations, the
+            mirror stays empty and loads on first use instead.
+
+        Args:
+            app (Flask): Application whose config is read.
+        """
+        self.enabled = bool(app.config.get('TREE_MIRROR'))
+
+        if not self.enabled:
+            return
+
+        if self.apply not in changes.listeners:
+            changes.listeners.append(self.apply)
+
+        with app.app_context():
+            try:
+                self.load()
+
+            except SQLAlchemyError:
+                db.session.rollback()
+
+    # ------------------------------------------
+    #   Updates
+    # ------------------------------------------
+
+    def load(self):
+        """ Replaces the mirror with the current DB content. """
+        node = Node.__table__
+
+        with self._lock:
+            version = tree_cache.current_version()
+            rows = db.session.execute(
+                select(_columns(node)).order_by(node.c.id)
+            ).fetchall()
+
+            nodes = {row.id: MirrorNode(row) for row in rows}
+
+            # Rows are sorted by id, so children lists come out sorted.
+            for record in nodes.values():
+                parent = nodes.get(record.parent_id)
+
+                if parent is not None:
+                    parent.children.append(record.id)
+
+            self._nodes = nodes
+            self.version = version
+
+    def sync(self, version=None):
+        """ Brings the mirror up to the DB version.
+
+        Args:
+            version (int): Current DB version if already known.
+        """
+        if version is None:
+            version = tree_cache.current_version()
+
+        with self._lock:
+            if self.version is None:
+                self.load()
+                return
+
+            if self.version >= version:
+                return
+
+            missed = changes.since(self.version)
+
+            if missed is None:
+                self.load()
+                return
+
+            self.apply(missed)
+
+    def apply(self, published):
+        """ Applies events in seq order, skipping those already applied.
+
+        Notes:
+            An event arriving ahead of a missing one is left for `sync` to
+            replay in order.
+
+        Args:
+            published (list): Change events, see `app.events`.
+        """
+        with self._lock:
+            if self.version is None:
+                return
+
+            for event in published:
+                if event['seq'] <= self.version:
+                    continue
+
+                if event['seq'] != self.version + 1:
+                    return
+
+                if not self._apply(event):
+                    self.version = None
+                    return
+
+                self.version = event['seq']
+
+    def _apply(self, event):
+        """ Applies a single event.
+
+        Args:
+            event (dict): Value of change event.
+
+        Returns:
+            bool: False if the event type is unknown.
+        """
+        kind = event['type']
+
+        if kind in (events.NODE_ADDED, events.NODE_UPDATED):
+            self._put(event['node'])
+
+        elif kind == events.NODE_DELETED:
+            self._remove(event['id'])
+
+        elif kind == events.NODE_MOVED:
+            record = self._nodes.get(event['id'])
+
+            if record is not None:
+                self._unlink(record)
+                record.parent_id = event['parent_id']
+                parent = self._nodes.get(record.parent_id)
+
+                if parent is not None:
+                    insort(parent.children, record.id)
+
+        elif kind == events.SUBTREE_REGENERATED:
+            self._load_subtree(event['root_id'])
+
+        elif kind == events.CHILDREN_REGENERATED:
+            parent = self._nodes.get(event['parent_id'])
+
+            for pk in list(parent.children if parent else ()):
+                self._remove(pk)
+
+            for child in event['children']:
+                self._put(child)
+
+        else:
+            return False
+
+        return True
+
+    def _load_subtree(self, pk):
+        """ Replaces the records of a subtree with the DB content.
+
+        Args:
+            pk (int): Id of the subtree root.
+        """
+        self._remove(pk)
+        rows = fetch_subtree_rows([pk])
+
+        for row in rows:
+            self._nodes[row.id] = MirrorNode(row)
+
+        # Linked once all records exist, a child may come before its parent.
+        for row in rows:
+            parent = self._nodes.get(row.parent_id)
+
+            if parent is not None:
+                insort(parent.children, row.id)
+
+    def _put(self, data):
+        """ Inserts or updates a record.
+
+        Args:
+            data (dict): Flat Node data.
+        """
+        record = self._nodes.get(data['id'])
+
+        if record is None:
+            record = MirrorNode(data)
+            self._nodes[record.id] = record
+        else:
+            self._unlink(record)
+            record.update(data)
+
+        parent = self._nodes.get(record.parent_id)
+
+        if parent is not None:
+            insort(parent.children, record.id)
+
+    def _unlink(self, record):
+        """ Detaches a record from its parent's children.
+
+        Args:
+            record (MirrorNode): Record to detach.
+        """
+        parent = self._nodes.get(record.parent_id)
+
+        if parent is not None and record.id in parent.children:
+            parent.children.remove(record.id)
+
+    def _remove(self, pk):
+        """ Removes a record and its subtree.
+
+        Args:
+            pk (int): Id of the subtree root.
+        """
+        record = self._nodes.get(pk)
+
+        if record is None:
+            return
+
+        self._unlink(record)
+        stack = [pk]
+
+        while stack:
+            record = self._nodes.pop(stack.pop(), None)
+
+            if record is not None:
+                stack.extend(record.children)
+
+    # ------------------------------------------
+    #   Reads
+    # ------------------------------------------
+
+    def _tree(self, pk):
+        """ Serializes the subtree of a record like `Node.serialize`.
+
+        Args:
+            pk (int): Id of the subtree root.
+
+        Returns:
+            dict: Serialized tree.
+        """
+        nodes = self._nodes
+        root = nodes[pk].serialize_flat()
+        stack = [(pk, root)]
+
+        while stack:
+            pk, data = stack.pop()
+
+            if data['can_have_children']:
+                data['children'] = []
+
+                for child_id in nodes[pk].children:
+                    child = nodes[child_id].serialize_flat()
+                    data['children'].append(child)
+                    stack.append((child_id, child))
+
+        return root
+
+    def subtree(self, pk, version=None):
+        """ Serializes the subtree of a Node from memory.
+
+        Args:
+            pk (int): Id of the subtree root.
+            version (int): Current DB version if already known.
+
+        Returns:
+            dict: Serialized tree or None if the node doesn't exist.
+        """
+        with self._lock:
+            self.sync(version)
+            return self._tree(pk) if pk in self._nodes else None
+
+    def root_trees(self, version=None):
+        """ Serializes the tree hanging from the Root node from memory.
+
+        Args:
+            version (int): Current DB version if already known.
+
+        Returns:
+            list: Serialized Root trees.
+        """
+        root_id = root_cache.get()
+        tree = self.subtree(root_id, version)
+        return [tree] if tree is not None else []
+
+    def root_columns(self, version=None):
+        """ Lays out the Root tree as parallel arrays from memory.
+
+        Args:
+            version (int): Current DB version if already known.
+
+        Returns:
+            dict: Same layout as `app.tree.rows_to_columns`.
+        """
+        root_id = root_cache.get()
+        columns = {
+            'roots': [root_id] if root_id is not None else [], 'id': [],
+            'parent_id': [], 'name': [], 'min_num': [], 'max_num': [],
+            'can_have_children': [],
+        }
+
+        with self._lock:
+            self.sync(version)
+            stack = [root_id] if root_id in self._nodes else []
+
+            # Depth first, so parents come before their children.
+            while stack:
+                record = self._nodes[stack.pop()]
+
+                for key in columns:
+                    if key != 'roots':
+                        columns[key].append(getattr(record, key))
+
+                stack.extend(reversed(record.children))
+
+        return columns
+
+
+mirror = TreeMirror()
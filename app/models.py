@@ -1,8 +1,28 @@
 # Modules
+from datetime import datetime
 from random import randint
 
+from sqlalchemy import String, case, cast, event, func, select, text
+from sqlalchemy.orm import Session, lazyload, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
 # db
 from app import db
+from app.cache import root_cache
+from app.encoders import json_backend
+from app.metrics import timed_serialize
+
+# Key of `Session.info` holding the Nodes a flush inserted, see
+# `fill_new_paths`.
+NEW_NODES_KEY = 'new_nodes'
+
+# Insert that leaves an existing Node of the same name untouched, completed
+# with the dialect specific conflict action by `Node.upsert`.
+UPSERT_SQL = """
+    INSERT INTO node (name, parent_id, can_have_children, min_num, max_num)
+    VALUES (:name, :parent_id, :can_have_children, :min_num, :max_num)
+    ON CONFLICT (name) WHERE can_have_children
+"""
 
 
 class Node(db.Model):
@@ -36,6 +56,64 @@ class Node(db.Model):
     min_num = db.Column(db.SmallInteger, nullable=True)
     max_num = db.Column(db.SmallInteger, nullable=True)
 
+    # Materialized path of ids from the tree root, e.g. '1/5/9/'. Maintained
+    # by the write paths, every subtree is a single prefix range scan.
+    path = db.Column(db.String, nullable=True)
+
+    # Incremented by every write of the Node, updates only apply while it
+    # still holds the value read (optimistic concurrency), see `bump_version`.
+    version = db.Column(
+        db.Integer,
+        default=1,
+        nullable=False,
+        server_default=text('1')
+    )
+
+    # Marks the single tree root, see `app.cache.root_cache`.
+    is_root = db.Column(
+        db.Boolean,
+        default=False,
+        nullable=False,
+        server_default=text('false')
+    )
+
+    __table_args__ = (
+        db.Index(
+            'ix_node_path', 'path',
+            postgresql_ops={'path': 'varchar_pattern_ops'}
+        ),
+        # Names are unique among nodes that can have children, generated
+        # leaves are named after random numbers and may repeat.
+        db.Index(
+            'uq_node_name', 'name',
+            unique=True,
+            postgresql_where=can_have_children,
+            sqlite_where=can_have_children
+        ),
+        db.Index(
+            'uq_node_is_root', 'is_root',
+            unique=True,
+            postgresql_where=is_root,
+            sqlite_where=is_root
+        ),
+        # Name prefix and substring searches, see `app.tree.search_nodes`.
+        # The trigram index needs the pg_trgm extension.
+        db.Index(
+            'ix_node_name_pattern', 'name',
+            postgresql_ops={'name': 'varchar_pattern_ops'}
+        ),
+        db.Index(
+            'ix_node_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        db.Index('ix_node_range', 'min_num', 'max_num'),
+    )
+
+    # ORM updates run `... WHERE version = <value read>` and raise
+    # StaleDataError if another transaction got there first.
+    __mapper_args__ = {'version_id_col': version}
+
     # ------------------------------------------
     #   Methods
     # ------------------------------------------
@@ -46,10 +124,8 @@ class Node(db.Model):
         Args:
             name (str): A unique Node name.
         """
-        max_rand = 970
         self.name = name
-        self.min_num = randint(1, max_rand)
-        self.max_num = randint(self.min_num, max_rand + 30)
+        self.min_num, self.max_num = self.random_range()
 
     def __str__(self):
         """ Returns Object string representation.
@@ -59,14 +135,41 @@ class Node(db.Model):
         """
         return '<Node {}>'.format(self.id)
 
+    @staticmethod
+    def random_range():
+        """ Returns a random min_num, max_num pair for a new Node.
+
+        Returns:
+            tuple: Value of min_num and max_num.
+        """
+        max_rand = 970
+        min_num = randint(1, max_rand)
+        return min_num, randint(min_num, max_rand + 30)
+
+    @property
+    def serialize_flat(self):
+        """ Returns a json serializable dict without the children key.
+
+        Returns:
+            dict: Key value pairs of essential Node data.
+        """
+        return {
+            'id':                self.id,
+            'name':              self.name,
+            'min_num':           self.min_num,
+            'max_num':           self.max_num,
+            'parent_id':         self.parent_id,
+            'can_have_children': self.can_have_children
+        }
+
     @property
     def serialize(self):
         """ Returns a json serializable dict.
         
         Notes:
-            What's cool about this is that the children's key recursively keeps
-            calling itself on all of the children of each new node. Causing the
-            output to look like which is pretty powerful.
+            The whole subtree is fetched with a single query and assembled in
+            memory, see `app.tree.load_subtree`. Causing the output to look
+            like which is pretty powerful.
             
             - Root
                 - level_1  
@@ -82,36 +185,523 @@ class Node(db.Model):
         Returns:
             dict: Key value pairs of essential Node data.
         """
-        base = {
-            'id':                self.id,
-            'name':              self.name,
-            'min_num':           self.min_num,
-            'max_num':           self.max_num,
-            'parent_id':         self.parent_id,
-            'can_have_children': self.can_have_children
+        from app.tree import load_subtree
+
+        with timed_serialize('node'):
+            return load_subtree(self.id)
+
+    @classmethod
+    def create_root(cls, name='Root'):
+        """ Creates the tree root unless one exists.
+
+        Notes:
+            A new root is published as a `node:added` change, so caches and
+            tree mirrors of running workers pick it up.
+
+        Args:
+            name (str): Value to name a new root.
+
+        Returns:
+            Node: Value of existing or created root.
+        """
+        root = cls.query.filter_by(is_root=True).first()
+
+        if not root:
+            from app.events import NODE_ADDED, changes
+
+            root = cls(name)
+            root.is_root = True
+            db.session.add(root)
+            db.session.flush()
+            changes.publish(NODE_ADDED, node=root.serialize_flat)
+            root_cache.invalidate()
+
+        return root
+
+    @classmethod
+    def upsert(cls, name, parent_id=None):
+        """ Atomically inserts a Node unless one with its name exists.
 
+        Notes:
+            Relies on the unique `uq_node_name` index, so concurrent requests
+            can't both create the same name. Postgres returns the new or
+            existing row in a single round trip. Nothing is committed.
+
+        Args:
+            name (str): Value to name new Node.
+            parent_id (int): Id of the parent of a new Node.
+
+        Returns:
+            tuple: Id of the new or existing Node and whether it was created.
+        """
+        connection = db.session.connection()
+        min_num, max_num = cls.random_range()
+        params = {
+            'name':              name,
+            'parent_id':         parent_id,
+            'can_have_children': True,
+            'min_num':           min_num,
+            'max_num':           max_num,
         }
-        if self.can_have_children:
-            return {**base, 'children': [c.serialize for c in self.sub_nodes]}
+
+        if connection.dialect.name == 'postgresql':
+            row = connection.execute(text(UPSERT_SQL + """
+                DO UPDATE SET name = EXCLUDED.name
+                RETURNING id, xmax = 0 AS created
+            """), params).first()
+            pk, created = row.id, row.created
+
         else:
-            return base
+            result = connection.execute(
+                text(UPSERT_SQL + ' DO NOTHING'), params)
+            pk, created = result.lastrowid, bool(result.rowcount)
+
+            if not created:
+                pk = connection.scalar(text(
+                    'SELECT id FROM node '
+                    'WHERE name = :name AND can_have_children'
+                ), params)
+
+        if created:
+            fill_path(connection, pk, parent_id)
+
+        return pk, created
 
     @classmethod
-    def get_or_create(cls, name):
+    def get_or_create(cls, name, parent_id=None):
         """
         Gets or creates a new Node.
         
         Args:
             name: (str) - Value to name new Node.
+            parent_id: (int) - Id of the parent of a new Node.
 
         Returns:
             Node: (object) - Value of existing or created Node.
 
         """
-        node = cls.query.filter_by(name=name).first()
+        pk, _ = cls.upsert(name, parent_id)
+        return cls.query.get(pk)
 
-        if not node:
-            instance = cls(name)
-            return instance
-        else:
-            return node
+    @classmethod
+    def bump_version(cls, node, expected=None):
+        """ Increments the version of `node` with a conditional UPDATE.
+
+        Notes:
+            The row stays locked until the transaction ends, so concurrent
+            writers of the same Node run one after the other. Nothing is
+            committed.
+
+        Args:
+            node (Node): Node being written.
+            expected (int): Version the row must still have, None for any.
+
+        Returns:
+            bool: False if the row changed since `expected` or is gone.
+        """
+        table = cls.__table__
+        query = table.update().where(table.c.id == node.id)
+
+        if expected is not None:
+            query = query.where(table.c.version == expected)
+
+        result = db.session.execute(
+            query.values(version=table.c.version + 1)
+        )
+        db.session.expire(node, ['version'])
+        return result.rowcount == 1
+
+    @classmethod
+    def regenerate_children(cls, parent, count):
+        """ Replaces the children of `parent` with `count` random leaves.
+
+        Notes:
+            Deletes and inserts with one executemany statement each, without
+            building ORM objects. Nothing is committed, the caller commits so
+            both happen in a single transaction. The parent's version is
+            bumped first, its row lock makes concurrent regenerations of the
+            same parent wait instead of both inserting children. The path is
+            read again under that lock, a move of the parent or one of its
+            ancestors may have committed since `parent` was loaded.
+
+        Args:
+            parent (Node): Node to generate children for.
+            count (int): Amount of children to generate.
+
+        Returns:
+            bool: False if the parent was deleted since it was loaded.
+        """
+        table = cls.__table__
+        rows = []
+
+        for i in range(count):
+            min_num, max_num = cls.random_range()
+            rows.append({
+                'name':              str(randint(parent.min_num,
+                                                 parent.max_num)),
+                'parent_id':         parent.id,
+                'can_have_children': False,
+                'min_num':           min_num,
+                'max_num':           max_num,
+            })
+
+        if not cls.bump_version(parent):
+            return False
+
+        path = cls.locked_path(parent)
+        db.session.execute(
+            table.delete().where(table.c.path.like(path + '%'))
+            .where(table.c.id != parent.id)
+        )
+        db.session.execute(table.insert(), rows)
+        db.session.execute(
+            table.update()
+            .where(table.c.parent_id == parent.id)
+            .values(path=path + cast(table.c.id, String) + '/')
+        )
+        return True
+
+    @classmethod
+    def locked_path(cls, node):
+        """ Reads the path of `node` again and sets it on the instance.
+
+        Notes:
+            Called once the row is locked, e.g. by `bump_version`, so a move
+            of the Node or one of its ancestors committed since it was loaded
+            is seen and can't happen before the commit.
+
+        Args:
+            node (Node): Node to refresh.
+
+        Returns:
+            str: Current path or None if the Node was deleted.
+        """
+        table = cls.__table__
+        path = db.session.execute(
+            select([table.c.path]).where(table.c.id == node.id)
+        ).scalar()
+
+        if path is not None:
+            set_committed_value(node, 'path', path)
+
+        return path
+
+    @classmethod
+    def lock_for_move(cls, node_id, parent_id, attempts=3):
+        """ Locks a Node, its new parent and the parent's ancestors.
+
+        Notes:
+            Rows are locked in id order and reloaded once locked, so the
+            cycle check sees current paths. With the whole ancestor chain of
+            the new parent locked, no concurrent move can put one of those
+            ancestors inside the moved subtree before the commit. If the
+            chain changed while waiting for the locks, the locks are
+            released and taken again on the new chain.
+
+        Args:
+            node_id (int): Id of the Node to move.
+            parent_id (int): Id of the new parent.
+            attempts (int): Times the locks are taken before giving up.
+
+        Returns:
+            dict: Locked Nodes by id, None if the chain kept changing.
+        """
+        parent = cls.query.options(lazyload(cls.parent)).get(parent_id)
+        wanted = {node_id, parent_id}
+
+        if parent is not None:
+            wanted.update(parent.ancestor_ids)
+
+        for attempt in range(attempts):
+            locked = {
+                n.id: n for n in cls.query
+                .options(lazyload(cls.parent))
+                .filter(cls.id.in_(wanted))
+                .order_by(cls.id)
+                .with_for_update()
+                .populate_existing()
+            }
+            parent = locked.get(parent_id)
+
+            if node_id not in locked or parent is None or \
+                    set(parent.ancestor_ids) <= set(locked):
+                return locked
+
+            db.session.rollback()
+            wanted.update(parent.ancestor_ids)
+
+        return None
+
+    @classmethod
+    def move(cls, node, parent):
+        """ Moves a Node and its subtree below `parent` with one UPDATE.
+
+        Notes:
+            The moved paths share the old prefix of `node`, which is swapped
+            for the new one while `parent_id` and `version` change on `node`
+            only.
+            Nothing is committed, see `app.helper_functions.validate_move`
+            for the checks to run first.
+
+        Args:
+            node (Node): Root of the subtree to move.
+            parent (Node): New parent.
+        """
+        table = cls.__table__
+        old_path = node.path
+        new_path = parent.path + str(node.id) + '/'
+        suffix = func.substr(table.c.path, len(old_path) + 1, type_=String)
+
+        db.session.execute(
+            table.update()
+            .where(table.c.path.like(old_path + '%'))
+            .values(
+                path=new_path + suffix,
+                parent_id=case(
+                    [(table.c.id == node.id, parent.id)],
+                    else_=table.c.parent_id
+                ),
+                version=case(
+                    [(table.c.id == node.id, table.c.version + 1)],
+                    else_=table.c.version
+                )
+            )
+        )
+        db.session.expire(node, ['version'])
+
+    @classmethod
+    def delete_subtree(cls, node):
+        """ Deletes a Node and all of its descendants with one statement.
+
+        Notes:
+            Deletes below the path read by `locked_path`, lock the row with
+            `bump_version` first.
+
+        Args:
+            node (Node): Root of the subtree to delete.
+        """
+        table = cls.__table__
+        path = cls.locked_path(node)
+
+        if path is not None:
+            db.session.execute(
+                table.delete().where(table.c.path.like(path + '%'))
+            )
+
+    @property
+    def ancestor_ids(self):
+        """ Returns the ids of the Node ancestors, tree root first.
+
+        Returns:
+            list: Ancestor ids, parsed from the path without a query.
+        """
+        return path_ancestor_ids(self.path)
+
+    def descendants_count(self):
+        """ Counts the Nodes below this one.
+
+        Returns:
+            int: Amount of descendants, excluding the Node itself.
+        """
+        return Node.query.filter(Node.path.like(self.path + '%')).count() - 1
+
+
+class TreeChange(db.Model):
+    """ Sequenced change of the node tree, see `app.events`. """
+
+    __tablename__ = 'tree_change'
+
+    # ------------------------------------------
+    #   Attributes
+    # ------------------------------------------
+
+    seq = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+
+    # ------------------------------------------
+    #   Methods
+    # ------------------------------------------
+
+    @property
+    def event(self):
+        """ Returns the delta event sent to Socket.IO clients.
+
+        Returns:
+            dict: Change payload with its seq and type.
+        """
+        data = json_backend.loads(self.payload)
+        return {**data, 'seq': self.seq, 'type': self.kind}
+
+
+class RegenerationJob(db.Model):
+    """ Background regeneration of the children of a subtree, see `app.jobs`.
+    """
+
+    __tablename__ = 'regeneration_job'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    # ------------------------------------------
+    #   Attributes
+    # ------------------------------------------
+
+    id = db.Column(db.Integer, primary_key=True)
+    root_id = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=QUEUED)
+    total = db.Column(db.Integer)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow
+    )
+    finished_at = db.Column(db.DateTime)
+
+    # ------------------------------------------
+    #   Methods
+    # ------------------------------------------
+
+    @property
+    def serialize(self):
+        """ Returns a json serializable dict.
+
+        Returns:
+            dict: Status and progress of the job.
+        """
+        return {
+            'id':          self.id,
+            'root_id':     self.root_id,
+            'count':       self.count,
+            'status':      self.status,
+            'total':       self.total,
+            'done':        self.done,
+            'error':       self.error,
+            'created_at':  _isoformat(self.created_at),
+            'finished_at': _isoformat(self.finished_at),
+        }
+
+
+def _isoformat(value):
+    """ Returns a datetime as an ISO 8601 string.
+
+    Args:
+        value (datetime): Value to format, may be None.
+
+    Returns:
+        str: Formatted value or None.
+    """
+    return value.isoformat() if value is not None else None
+
+
+def path_ancestor_ids(path):
+    """ Returns the ancestor ids stored in a materialized path.
+
+    Args:
+        path (str): Value of `Node.path`, e.g. '1/5/9/'.
+
+    Returns:
+        list: Ancestor ids, tree root first, e.g. [1, 5].
+    """
+    return [int(pk) for pk in path.split('/')[:-2]]
+
+
+def fill_path(connection, pk, parent_id):
+    """ Sets the path of a newly inserted Node from its parent path.
+
+    Args:
+        connection (Connection): Connection of the inserting transaction.
+        pk (int): Id of the new Node.
+        parent_id (int): Id of its parent, None for a tree root.
+
+    Returns:
+        str: Value of the new path.
+    """
+    table = Node.__table__
+    path = ''
+
+    if parent_id is not None:
+        path = connection.scalar(
+            table.select().with_only_columns([table.c.path])
+            .where(table.c.id == parent_id)
+        ) or ''
+
+    path += f'{pk}/'
+    connection.execute(
+        table.update().where(table.c.id == pk).values(path=path)
+    )
+    return path
+
+
+@event.listens_for(Node, 'after_insert')
+def collect_new_node(mapper, connection, target):
+    """ Remembers a Node inserted through the ORM for `fill_new_paths`.
+
+    Args:
+        mapper (Mapper): Node mapper.
+        connection (Connection): Connection used by the flush.
+        target (Node): Newly inserted Node.
+    """
+    object_session(target).info.setdefault(NEW_NODES_KEY, []).append(target)
+
+
+@event.listens_for(Session, 'after_flush')
+def fill_new_paths(session, flush_context):
+    """ Fills the paths of the Nodes a flush inserted, one UPDATE per parent.
+
+    Notes:
+        Like `Node.regenerate_children`, the new children of a parent get
+        their path in a single statement instead of a SELECT and an UPDATE
+        per row. Parents are inserted before their children, so the path of
+        a parent inserted by the same flush is known by then.
+
+    Args:
+        session (Session): Session that flushed.
+        flush_context (UOWTransaction): State of the flush.
+    """
+    inserted = session.info.pop(NEW_NODES_KEY, None)
+
+    if not inserted:
+        return
+
+    table = Node.__table__
+    connection = session.connection()
+    paths = {}
+    children = {}
+
+    for node in inserted:
+        children.setdefault(node.parent_id, []).append(node)
+
+    for parent_id, nodes in children.items():
+        prefix = paths.get(parent_id, '')
+
+        if parent_id is not None and parent_id not in paths:
+            prefix = connection.scalar(
+                select([table.c.path]).where(table.c.id == parent_id)
+            ) or ''
+
+        connection.execute(
+            table.update()
+            .where(table.c.parent_id == parent_id)
+            .where(table.c.path.is_(None))
+            .values(path=prefix + cast(table.c.id, String) + '/')
+        )
+
+        for node in nodes:
+            paths[node.id] = f'{prefix}{node.id}/'
+            set_committed_value(node, 'path', paths[node.id])
+
+
+@event.listens_for(Node.__table__, 'before_create')
+def create_trgm_extension(target, connection, **kwargs):
+    """ Enables pg_trgm before `create_all` builds the trigram index.
+
+    Args:
+        target (Table): Node table.
+        connection (Connection): Connection creating the table.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
@@ -1,29 +1,66 @@
 # Flask
-import json
-from random import randint
-from flask_socketio import emit, send
-from flask import Blueprint, jsonify, request
+from flask_socketio import emit, join_room, leave_room, send
+from flask import (
+    Blueprint, Response, current_app, request, stream_with_context, url_for
+)
 
 # DB connector.
 from app import db, socketio
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 # Models
-from app.models import Node
+from app.models import Node, RegenerationJob
+from app.tree import (
+    get_root_ids, load_children, load_subtree_columns, load_subtrees_paged,
+    search_nodes
+)
 
 # Utils
-from app.helper_functions import get_object
-from app.exceptions import ObjectDoesntExist
+from app.cache import root_cache, stats_cache, tree_cache
+from app.database import route_reads, stick_to_primary
+from app.compression import compress_response
+from app.encoders import COLUMNAR, MEDIA_TYPES, encode, jsonify, negotiate
+from app import events
+from app.broadcast import scheduler
+from app.events import changes
+from app.export import iter_json, iter_ndjson
+from app.jobs import JOBS_ROOM, runner
+from app.mirror import mirror
+from app.metrics import finish_request, render_metrics, start_request
+from app.helper_functions import (
+    check_if_match, get_object, parse_search_args, parse_tree_args,
+    validate_move, validate_name, validate_update, version_tag
+)
+from app.exceptions import (
+    ObjectDoesntExist, PreconditionFailed, ValidationError
+)
 
 # Create new flask blueprint
 node_app = Blueprint('node', __name__)
 
+# Header holding the row version a write's If-Match must send back.
+VERSION_HEADER = 'X-Node-Version'
+
+# Time every request, after_request hooks run in reverse order.
+node_app.before_request(start_request)
+node_app.after_request(finish_request)
+
+# Safe requests read from a replica, writes pin the client to the primary.
+node_app.before_request(route_reads)
+node_app.after_request(stick_to_primary)
+
+# Compress large bodies, runs before the response is timed.
+node_app.after_request(compress_response)
+
 
 @node_app.route('/', methods=['GET', 'POST'])
 def node_list():
     """ Lists or creates nodes.
     
     Notes:
-        Before creating we make sure there isn't already a node with the same name.
+        Creating is an atomic upsert on the unique name index, so a node with
+        the same name can't be created twice.
         We also check to see if a name key exists on the request to prevent breaking
         the app.
     
@@ -35,8 +72,22 @@ def node_list():
     # ------------------------------------------
 
     if request.method == 'GET':
-        root_node = Node.query.filter_by(name='Root')
-        return jsonify([node.serialize for node in root_node]), 200
+        try:
+            tree_args = parse_tree_args(request.args)
+
+        except ValidationError as error:
+            return jsonify(error.message), 400
+
+        if tree_args:
+            trees = load_subtrees_paged(get_root_ids(), **tree_args)
+            return jsonify(trees), 200
+
+        encoding = negotiate(request.accept_mimetypes)
+        payload, version = tree_cache.get(encoding)
+        response = Response(payload, 200, mimetype=MEDIA_TYPES[encoding])
+        response.set_etag(tree_cache.etag_for(version, encoding))
+        response.vary.add('Accept')
+        return response.make_conditional(request)
 
     # ------------------------------------------
     #   POST
@@ -46,33 +97,35 @@ def node_list():
 
         name = request.json.get('name')
 
-        if name and isinstance(name, str) and len(name) >= 5:
+        try:
+            validate_name(name)
 
-            node = Node.query.filter_by(name=name).first()
+        except ValidationError as error:
+            return jsonify(error.message), 400
 
-            if node:
-                return jsonify(f'Node with name {name} already exists'), 400
-
-            else:
-                # Grab root node.
-                root_node = Node.query.filter_by(name='Root').first()
+        else:
 
-                # Create new node & make relationship
-                node = Node(name)
-                node.parent = root_node
+            # Create new node under root unless the name is taken.
+            pk, created = Node.upsert(name, parent_id=root_cache.get())
 
-                # Add new node to session.
-                db.session.add(node)
-                db.session.commit()
-                return jsonify(node.serialize), 201
+            if not created:
+                return jsonify(f'Node with name {name} already exists'), 400
 
-        else:
-            return jsonify('Name must be minimum of 5 Alpha characters'), 400
+            node = Node.query.get(pk)
+            changes.publish(events.NODE_ADDED, node=node.serialize_flat)
+            return jsonify(node.serialize), 201
 
 
 @node_app.route('/<pk>/', methods=['GET', 'PUT', 'DELETE'])
 def node_detail(pk):
     """ Gets, Updates, Deletes a specific node.
+
+    Notes:
+        Full subtree reads are tagged with the tree version and encoding,
+        so any change below the node changes the ETag. Responses read from
+        the DB carry the node's own row version in X-Node-Version. PUT and
+        DELETE honor If-Match against it (412 once the node changed) and
+        never overwrite a concurrent write, they answer 409 instead.
     
     Args:
         pk (int): Value of node id.
@@ -80,6 +133,20 @@ def node_detail(pk):
     Returns:
         (object): Value of specific Node. 
     """
+    # Plain subtree reads are served from memory when the mirror is on.
+    if request.method == 'GET' and mirror.enabled and not request.args and \
+            negotiate(request.accept_mimetypes) == 'json':
+        version = tree_cache.current_version()
+        tree = mirror.subtree(int(pk), version)
+
+        if tree is None:
+            return jsonify(f"Node with id {pk} doesn't exist"), 404
+
+        response = jsonify(tree)
+        response.set_etag(f'node-{int(pk)}-' + tree_cache.etag_for(version))
+        response.vary.add('Accept')
+        return response.make_conditional(request)
+
     # Attempt to get the object based id before even doing any processing.
     try:
         node = get_object(Node, pk)
@@ -93,7 +160,37 @@ def node_detail(pk):
         # ------------------------------------------
 
         if request.method == 'GET':
-            return jsonify(node.serialize), 200
+            try:
+                tree_args = parse_tree_args(request.args)
+
+            except ValidationError as error:
+                return jsonify(error.message), 400
+
+            if tree_args:
+                tree = load_subtrees_paged([node.id], **tree_args)[0]
+                return jsonify(tree), 200
+
+            # Read before the subtree and from the same DB, so the tag never
+            # claims a newer version than the body holds.
+            version = tree_cache.current_version(
+                replica=db.session().use_replica
+            )
+            encoding = negotiate(request.accept_mimetypes)
+
+            if encoding in COLUMNAR:
+                columns = load_subtree_columns([node.id])
+                response = Response(
+                    encode(encoding, columns), mimetype=MEDIA_TYPES[encoding]
+                )
+            else:
+                response = jsonify(node.serialize)
+
+            response.set_etag(
+                f'node-{node.id}-' + tree_cache.etag_for(version, encoding)
+            )
+            response.headers[VERSION_HEADER] = version_tag(node)
+            response.vary.add('Accept')
+            return response.make_conditional(request)
 
         # ------------------------------------------
         #   PUT
@@ -101,48 +198,61 @@ def node_detail(pk):
 
         if request.method == 'PUT':
 
-            # Fields
-            name = request.json.get('name')
-            min_num = request.json.get('min_num')
-            max_num = request.json.get('max_num')
-
             # Sanity checks on incoming data.
-            # Make sure data is of appropriate type.
-            if isinstance(name, str) and node.name != name and len(name) >= 5:
-                node.name = name
+            try:
+                check_if_match(node, request.if_match)
+                updates = validate_update(node, request.json)
 
-            # Checks if min and max are integers.
-            if isinstance(min_num, int) and isinstance(max_num, int):
+            except PreconditionFailed as error:
+                return jsonify(error.message), 412
 
-                # Checks if numbers are within bounds.
-                if 0 <= min_num <= 970 and 1 <= max_num <= 1000:
+            except ValidationError as error:
+                return jsonify(error.message), 400
 
-                    # Checks if min is less than max.
-                    if min_num < max_num:
-                        node.min_num = min_num
-                        node.max_num = max_num
+            for attr, value in updates.items():
+                setattr(node, attr, value)
 
-                    else:
-                        return jsonify('min_num must be less tha max_num'), 400
+            # The UPDATE only applies to the version read above.
+            try:
+                db.session.flush()
 
-                else:
-                    return jsonify(
-                        'min_num and or max_num are out of bounds.'), 400
+            except StaleDataError:
+                db.session.rollback()
+                msg = f'Node with id {pk} was modified by another request'
+                return jsonify(msg), 409
 
-            else:
-                return jsonify('min_num and max_num must be integers'), 400
+            # A concurrent rename took the name after validate_update.
+            except IntegrityError:
+                db.session.rollback()
+                msg = f"Node with name {updates.get('name')} already exists"
+                return jsonify(msg), 400
 
-            db.session.commit()
-            return jsonify(node.serialize), 200
+            changes.publish(events.NODE_UPDATED, node=node.serialize_flat)
+            response = jsonify(node.serialize)
+            response.headers[VERSION_HEADER] = version_tag(node)
+            return response, 200
 
     # ------------------------------------------
     #   DELETE
     # ------------------------------------------
 
     if request.method == 'DELETE':
-        if node.name != 'Root':
-            db.session.delete(node)
-            db.session.commit()
+        if not node.is_root:
+            try:
+                check_if_match(node, request.if_match)
+
+            except PreconditionFailed as error:
+                return jsonify(error.message), 412
+
+            deleted = {'id': node.id, 'parent_id': node.parent_id}
+
+            if not Node.bump_version(node, node.version):
+                db.session.rollback()
+                msg = f'Node with id {pk} was modified by another request'
+                return jsonify(msg), 409
+
+            Node.delete_subtree(node)
+            changes.publish(events.NODE_DELETED, **deleted)
             return jsonify('Successfully Deleted.'), 204
         else:
             return jsonify("Can't delete the Root node."), 400
@@ -172,22 +282,24 @@ def create_sub_nodes(pk):
         # Make sure they sent amount to generate.
         if count and isinstance(count, int):
 
-            # Delete previous sub nodes.
-            Node.query.filter_by(parent=parent).delete()
-            db.session.commit()
+            max_count = current_app.config['MAX_SUB_NODES']
 
-            if count < 1 or count > 15:
-                msg = 'Number of children to generate should be between 1-15'
+            if count < 1 or count > max_count:
+                msg = 'Number of children to generate should be between ' \
+                      f'1-{max_count}'
                 return jsonify(msg), 400
 
-            # Create new nodes.
-            for i in range(count):
-                node_name = str(randint(parent.min_num, parent.max_num))
-                node = Node(name=node_name)
-                node.can_have_children = False
-                node.parent = parent
-                db.session.add(node)
-            db.session.commit()
+            # Replace previous sub nodes in a single transaction, committed
+            # with the change event.
+            if not Node.regenerate_children(parent, count):
+                db.session.rollback()
+                return jsonify(f"Node with id {pk} doesn't exist"), 404
+
+            changes.publish(
+                events.CHILDREN_REGENERATED,
+                parent_id=parent.id,
+                children=load_children(parent.id)
+            )
 
             # Return new node tree.
             return jsonify('New nodes Created.'), 200
@@ -196,13 +308,473 @@ def create_sub_nodes(pk):
             return jsonify('Must send amount of children to generate'), 400
 
 
+@node_app.route('/<pk>/move/', methods=['POST'])
+def move_node(pk):
+    """ Moves a node and its subtree below another node.
+
+    Notes:
+        Expects `{'parent_id': ...}`. The node, the new parent and its
+        ancestors are locked and reloaded before the cycle check, see
+        `Node.lock_for_move`, so concurrent moves can't build a cycle.
+        Then the whole subtree is relinked with a single UPDATE and one
+        `node:moved` event is published.
+
+    Args:
+        pk (int): Value of node id.
+
+    Returns:
+        (object): Value of the moved node, without its subtree.
+    """
+    parent_id = request.json.get('parent_id')
+
+    if not isinstance(parent_id, int):
+        return jsonify('parent_id must be an integer'), 400
+
+    locked = Node.lock_for_move(int(pk), parent_id)
+
+    if locked is None:
+        db.session.rollback()
+        return jsonify('The tree kept changing, try again'), 409
+
+    node, parent = locked.get(int(pk)), locked.get(parent_id)
+
+    if node is None or parent is None:
+        db.session.rollback()
+        missing = pk if node is None else parent_id
+        return jsonify(f"Node with id {missing} doesn't exist"), 404
+
+    try:
+        validate_move(node, parent)
+
+    except ValidationError as error:
+        db.session.rollback()
+        return jsonify(error.message), 400
+
+    if node.parent_id == parent.id:
+        db.session.rollback()
+        return jsonify(node.serialize_flat), 200
+
+    moved = {
+        'id':            node.id,
+        'parent_id':     parent.id,
+        'old_parent_id': node.parent_id,
+    }
+    Node.move(node, parent)
+    changes.publish(events.NODE_MOVED, **moved)
+
+    return jsonify(node.serialize_flat), 200
+
+
+@node_app.route('/regenerate/', defaults={'pk': None}, methods=['POST'])
+@node_app.route('/<pk>/regenerate/', methods=['POST'])
+def regenerate_subtree(pk):
+    """ Starts a background job regenerating the children of a subtree.
+
+    Notes:
+        Every node of the subtree that can have children gets `count` new
+        children, see `app.jobs`. Without `pk` the whole tree is regenerated.
+        Progress is pushed as `job:progress` events to clients that emitted
+        `subscribe:jobs` and can be polled from node_job.
+
+    Args:
+        pk (int): Value of subtree root id, None for the Root.
+
+    Returns:
+        (object): Value of the queued job.
+    """
+    if pk is None:
+        pk = root_cache.get()
+
+    if pk is None:
+        return jsonify("The Root node doesn't exist"), 404
+
+    try:
+        root = get_object(Node, pk)
+
+    except ObjectDoesntExist as error:
+        return jsonify(error.message), 404
+
+    count = request.json.get('count')
+    max_count = current_app.config['MAX_SUB_NODES']
+
+    if not isinstance(count, int) or count < 1 or count > max_count:
+        msg = f'Number of children to generate should be between 1-{max_count}'
+        return jsonify(msg), 400
+
+    app = current_app._get_current_object()
+    job = runner.submit(app, root, count)
+
+    response = jsonify(job.serialize)
+    response.headers['Location'] = url_for('node.node_job', job_id=job.id)
+    return response, 202
+
+
+@node_app.route('/jobs/<int:job_id>/', methods=['GET'])
+def node_job(job_id):
+    """ Gets the status of a regeneration job.
+
+    Args:
+        job_id (int): Value of job id.
+
+    Returns:
+        (object): Status and progress of the job.
+    """
+    job = RegenerationJob.query.get(job_id)
+
+    if job is None:
+        return jsonify(f"Job with id {job_id} doesn't exist"), 404
+
+    return jsonify(job.serialize), 200
+
+
+def _apply_operations(operations, nodes, root_id):
+    """ Applies the operations of a batch to the session.
+
+    Notes:
+        Creates are inserted right away, updates are set on the loaded
+        nodes and deletes lock their row with a conditional version bump.
+        Queries of later operations may flush earlier updates, so callers
+        must handle StaleDataError and IntegrityError around this call.
+
+    Args:
+        operations (list): Operations sent to node_batch.
+        nodes (dict): Referenced Nodes by id, deleted ones are removed.
+        root_id (int): Id of the Root, parent of created nodes.
+
+    Returns:
+        tuple: Result per operation and the (index, kind, node or id) of
+            every change to publish.
+    """
+    results = []
+    pending = []
+
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+
+        if kind == 'create':
+            name = op.get('name')
+
+            try:
+                validate_name(name)
+
+            except ValidationError as error:
+                results.append({'status': 400, 'error': error.message})
+                continue
+
+            pk, created = Node.upsert(name, parent_id=root_id)
+
+            if not created:
+                msg = f'Node with name {name} already exists'
+                results.append({'status': 400, 'error': msg})
+                continue
+
+            results.append({'status': 201})
+            pending.append((index, events.NODE_ADDED, pk))
+
+        elif kind in ('update', 'delete'):
+            node = nodes.get(op.get('id'))
+
+            if node is None:
+                msg = f"Node with id {op.get('id')} doesn't exist"
+                results.append({'status': 404, 'error': msg})
+                continue
+
+            version = op.get('version')
+
+            if version is not None and version != node.version:
+                msg = f'Node with id {node.id} is at version {node.version}'
+                results.append({'status': 409, 'error': msg})
+                continue
+
+            if kind == 'update':
+                try:
+                    updates = validate_update(node, op)
+
+                except ValidationError as error:
+                    results.append({'status': 400, 'error': error.message})
+                    continue
+
+                for attr, value in updates.items():
+                    setattr(node, attr, value)
+
+                results.append({'status': 200})
+                pending.append((index, events.NODE_UPDATED, node))
+
+            elif node.is_root:
+                msg = "Can't delete the Root node."
+                results.append({'status': 400, 'error': msg})
+
+            # Like DELETE, only delete the version read above.
+            elif not Node.bump_version(node, node.version):
+                msg = f'Node with id {node.id} was modified by another request'
+                results.append({'status': 409, 'error': msg})
+
+            else:
+                # Subtrees are deleted once the ORM changes are flushed.
+                del nodes[node.id]
+                results.append({'status': 204})
+                pending.append((index, events.NODE_DELETED, node))
+
+        else:
+            msg = "op must be one of 'create', 'update' or 'delete'"
+            results.append({'status': 400, 'error': msg})
+
+    return results, pending
+
+
+@node_app.route('/batch/', methods=['POST'])
+def node_batch():
+    """ Creates, updates and deletes many nodes in one request.
+
+    Notes:
+        Expects a list of operations like `{'op': 'create', 'name': ...}`,
+        `{'op': 'update', 'id': ..., 'min_num': ..., 'max_num': ...}` or
+        `{'op': 'delete', 'id': ...}`, validated with the same rules as
+        node_list and node_detail. Every referenced node is fetched with one
+        IN query and all valid operations are committed together, invalid
+        ones are reported without affecting the rest. Updates and deletes
+        may send the `version` they expect, like If-Match, and get a 409 if
+        the node moved on.
+
+    Returns:
+        (list): Status code and result or error message per operation.
+    """
+    operations = request.json
+
+    if not isinstance(operations, list):
+        return jsonify('Must send a list of operations'), 400
+
+    max_operations = current_app.config['MAX_BATCH_OPERATIONS']
+
+    if len(operations) > max_operations:
+        msg = f'A batch can contain at most {max_operations} operations'
+        return jsonify(msg), 400
+
+    # Resolve every referenced node with one query.
+    ids = {
+        op.get('id') for op in operations
+        if isinstance(op, dict) and isinstance(op.get('id'), int)
+    }
+    nodes = {n.id: n for n in Node.query.filter(Node.id.in_(ids))} \
+        if ids else {}
+
+    # Flush updates, then serialize before the commit expires them. Updates
+    # apply to the versions read above, a concurrent write fails the batch,
+    # whether it shows up in the final flush or in one of the operations.
+    try:
+        results, pending = _apply_operations(
+            operations, nodes, root_cache.get()
+        )
+        db.session.flush()
+
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify('A node was modified by another request'), 409
+
+    # Two updates of the batch, or a concurrent rename, took the same name.
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify('Updates would give two nodes the same name'), 400
+
+    created_ids = [pk for _, kind, pk in pending if kind == events.NODE_ADDED]
+
+    if created_ids:
+        nodes.update(
+            (n.id, n) for n in Node.query.filter(Node.id.in_(created_ids))
+        )
+
+    published = []
+
+    for index, kind, node in pending:
+        if kind == events.NODE_ADDED:
+            node = nodes[node]
+
+        if kind == events.NODE_DELETED:
+            data = {'id': node.id, 'parent_id': node.parent_id}
+            Node.delete_subtree(node)
+        else:
+            data = {'node': node.serialize_flat}
+            results[index]['node'] = data['node']
+
+        published.append((kind, data))
+
+    changes.publish_many(published)
+
+    return jsonify(results), 200
+
+
+@node_app.route('/export/', methods=['GET'])
+def node_export():
+    """ Streams the node tree.
+
+    Notes:
+        `format=ndjson` streams one flat node per line instead of the nested
+        JSON list, `root=<id>` exports a single subtree instead of the Root
+        trees. Rows are read through a server side cursor so memory stays
+        bounded.
+
+    Returns:
+        (Response): Streaming JSON or NDJSON response.
+    """
+    root = request.args.get('root')
+
+    if root is not None:
+        try:
+            root_ids = [get_object(Node, root).id]
+
+        except ObjectDoesntExist as error:
+            return jsonify(error.message), 404
+
+    else:
+        root_ids = get_root_ids()
+
+    chunk_size = current_app.config['EXPORT_CHUNK_ROWS']
+
+    if request.args.get('format') == 'ndjson':
+        chunks = iter_ndjson(root_ids, chunk_size)
+        mimetype = 'application/x-ndjson'
+    else:
+        chunks = iter_json(root_ids, chunk_size)
+        mimetype = 'application/json'
+
+    return Response(stream_with_context(chunks), 200, mimetype=mimetype)
+
+
+@node_app.route('/stats/', defaults={'pk': None}, methods=['GET'])
+@node_app.route('/<pk>/stats/', methods=['GET'])
+def node_stats(pk):
+    """ Gets aggregate statistics of a Node's subtree.
+
+    Notes:
+        Computed by one SQL query and cached until the tree changes, the
+        ETag follows the tree version. Without an id the whole tree below
+        the Root is described.
+
+    Args:
+        pk (int): Value of node id, None for the Root.
+
+    Returns:
+        (object): Descendant, leaf and depth counts and the min / max / avg
+            of `min_num` and `max_num` over the descendants.
+    """
+    if pk is None:
+        pk = root_cache.get()
+
+    stats = version = None
+
+    if pk is not None and str(pk).isdigit():
+        stats, version = stats_cache.get(int(pk))
+
+    if stats is None:
+        return jsonify(f"Node with id {pk} doesn't exist"), 404
+
+    response = jsonify(stats)
+    response.set_etag(f'stats-{version}-{pk}')
+    return response.make_conditional(request)
+
+
+@node_app.route('/search/', methods=['GET'])
+def node_search():
+    """ Searches nodes by name and range.
+
+    Notes:
+        `name=<text>` matches names starting with the text, or containing it
+        with `match=contains`. `contains=N` matches the nodes whose range
+        includes N, `min_num` / `max_num` those overlapping them and
+        `root=<id>` restricts the search to a subtree. Matches are flat,
+        ordered by id, with the ids of their ancestors; pass `next` back as
+        `after` for the following page.
+
+    Returns:
+        (object): Matches and the `after` value of the next page.
+    """
+    max_results = current_app.config['SEARCH_MAX_RESULTS']
+
+    try:
+        filters = parse_search_args(request.args, max_results)
+
+        if 'root' in filters:
+            filters['root'] = get_object(Node, filters['root'])
+
+    except ValidationError as error:
+        return jsonify(error.message), 400
+
+    except ObjectDoesntExist as error:
+        return jsonify(error.message), 404
+
+    results, next_after = search_nodes(**filters)
+    return jsonify({'results': results, 'next': next_after}), 200
+
+
+@node_app.route('/metrics/', methods=['GET'])
+def node_metrics():
+    """ Exposes request, SQL, serialization and emit metrics.
+
+    Returns:
+        (Response): Metrics in the Prometheus text format.
+    """
+    return Response(render_metrics(), 200, mimetype='text/plain')
+
+
 @socketio.on('connect')
 def handle_connect():
     print('connected')
+    join_room(events.FULL_ROOM)
+
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    scheduler.forget(request.sid)
 
 
 @socketio.on('update:nodes')
 def handle_update():
-    root_node = Node.query.filter_by(name='Root')
-    data = json.dumps([node.serialize for node in root_node])
-    emit('update', data, broadcast=True)
+    scheduler.request(request.sid)
+
+
+@socketio.on('subscribe:jobs')
+def handle_subscribe_jobs():
+    """ Starts sending the client `job:progress` events. """
+    join_room(JOBS_ROOM)
+
+
+@socketio.on('subscribe:gzip')
+def handle_subscribe_gzip():
+    """ Switches the client to gzip compressed full tree broadcasts.
+
+    Notes:
+        `update` then carries the JSON tree gzipped as binary, for clients
+        that can inflate it, e.g. with DecompressionStream.
+    """
+    leave_room(events.FULL_ROOM)
+    join_room(events.FULL_GZIP_ROOM)
+
+
+@socketio.on('subscribe:nodes')
+def handle_subscribe(data=None):
+    """ Switches the client from full tree broadcasts to deltas.
+
+    Args:
+        data (dict): Optional `seq` the client has already seen.
+    """
+    leave_room(events.FULL_ROOM)
+    leave_room(events.FULL_GZIP_ROOM)
+    join_room(events.DELTA_ROOM)
+    handle_sync(data)
+
+
+@socketio.on('sync:nodes')
+def handle_sync(data=None):
+    """ Sends the client the deltas it missed or a full snapshot.
+
+    Args:
+        data (dict): Optional `seq` the client has already seen.
+    """
+    seq = (data or {}).get('seq')
+    missed = changes.since(seq)
+
+    if missed is not None:
+        emit('deltas', missed)
+    else:
+        payload, version = tree_cache.get()
+        emit('snapshot', {'seq': version, 'nodes': payload.decode('utf-8')})
@@ -0,0 +1,77 @@
+""" Module configuring Socket.IO to broadcast across worker processes. """
+# Modules
+from collections import defaultdict
+from queue import Queue
+from threading import Lock
+
+from socketio import PubSubManager
+
+# Message queue URL selecting the in-process stand-in.
+LOCAL_QUEUE = 'local://'
+
+
+class LocalManager(PubSubManager):
+    """ In-process stand-in for a Redis message queue.
+
+    Notes:
+        Every Socket.IO server of the process using the same channel receives
+        the messages the others publish, which lets tests and local setups
+        run several servers the way separate workers would with Redis.
+    """
+
+    name = 'local'
+
+    # channel -> subscriber queues, shared by every instance.
+    _subscribers = defaultdict(list)
+    _subscribers_lock = Lock()
+
+    def _publish(self, data):
+        """ Hands a message to every subscriber of the channel.
+
+        Args:
+            data (dict): Value of message.
+        """
+        with self._subscribers_lock:
+            queues = list(self._subscribers[self.channel])
+
+        for queue in queues:
+            queue.put(data)
+
+    def _listen(self):
+        """ Yields messages published on the channel.
+
+        Yields:
+            dict: Value of message.
+        """
+        queue = Queue()
+
+        with self._subscribers_lock:
+            self._subscribers[self.channel].append(queue)
+
+        while True:
+            yield queue.get()
+
+
+def socketio_options(config):
+    """ Returns the SocketIO keyword arguments for a config.
+
+    Notes:
+        Without SOCKETIO_MESSAGE_QUEUE broadcasts only reach clients of the
+        same process, so gunicorn must run a single worker.
+
+    Args:
+        config (Config): Application config.
+
+    Returns:
+        dict: Keyword arguments for `SocketIO`.
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+
+    if not url:
+        return {}
+
+    if url == LOCAL_QUEUE:
+        return {'client_manager': LocalManager(channel=channel)}
+
+    return {'message_queue': url, 'channel': channel}
@@ -0,0 +1,92 @@
+""" Module with the test case every test of the app inherits from. """
+# Modules
+import json
+
+from flask_testing import TestCase
+from sqlalchemy import event
+
+# db
+from app import create_app, db
+from app.models import Node
+
+# Utils
+from app.cache import root_cache, stats_cache, tree_cache
+
+
+class BaseTestCase(TestCase):
+    """ Runs each test against a new in-memory database with a Root. """
+
+    def create_app(self):
+        """ Creates the app with the test settings.
+
+        Returns:
+            Flask: Application under test.
+        """
+        return create_app('app.config.TestConfig')
+
+    def setUp(self):
+        """ Creates the tables and the Root node. """
+        db.create_all()
+        self.root = Node.create_root()
+
+    def tearDown(self):
+        """ Drops the tables and the process caches built from them. """
+        db.session.remove()
+        db.drop_all()
+
+        for cache in (root_cache, stats_cache, tree_cache):
+            cache.invalidate()
+
+    def send_json(self, method, url, data, headers=None):
+        """ Sends `data` as a JSON body.
+
+        Args:
+            method (str): Value of HTTP method.
+            url (str): Value of url to request.
+            data (dict|list): Body to encode.
+            headers (dict): Extra request headers, e.g. If-Match.
+
+        Returns:
+            Response: Response of the app.
+        """
+        return self.client.open(
+            url, method=method, data=json.dumps(data),
+            content_type='application/json', headers=headers
+        )
+
+    def create(self, name):
+        """ Creates a factory under the Root through the API.
+
+        Args:
+            name (str): Value to name new Node.
+
+        Returns:
+            dict: Serialized new Node.
+        """
+        response = self.send_json('POST', '/api/nodes/', {'name': name})
+        self.assertEqual(response.status_code, 201)
+        return response.json
+
+    def count_statements(self, work):
+        """ Runs `work` and counts the statements it sends.
+
+        Args:
+            work (function): Code to run.
+
+        Returns:
+            int: Amount of statements executed.
+        """
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+
+        engine = db.get_engine(self.app)
+        event.listen(engine, 'before_cursor_execute', count)
+
+        try:
+            work()
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        return len(statements)
@@ -0,0 +1,72 @@
+""" Tests of the batch node endpoint. """
+# db
+from app.models import Node
+
+# Utils
+from app.cache import tree_cache
+from app.tests.base import BaseTestCase
+
+
+class TestBatch(BaseTestCase):
+    """ Many operations per request, each with its own result. """
+
+    url = '/api/nodes/batch/'
+
+    def setUp(self):
+        """ Creates two factories under the Root. """
+        super().setUp()
+        self.first = self.create('factory1')
+        self.second = self.create('factory2')
+
+    def test_mixed_operations(self):
+        """ Valid creates, updates and deletes apply with one commit. """
+        version = tree_cache.current_version()
+        ops = [
+            {'op': 'create', 'name': 'factory3'},
+            {'op': 'update', 'id': self.first['id'], 'name': 'renamed',
+             'min_num': 1, 'max_num': 2},
+            {'op': 'delete', 'id': self.second['id']},
+        ]
+
+        response = self.send_json('POST', self.url, ops)
+        first = Node.query.get(self.first['id'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.json], [201, 200, 204]
+        )
+        self.assertEqual(response.json[0]['node']['name'], 'factory3')
+        self.assertEqual((first.name, first.min_num), ('renamed', 1))
+        self.assertIsNone(Node.query.get(self.second['id']))
+        self.assertEqual(tree_cache.current_version(), version + 3)
+
+    def test_invalid_operations_are_reported(self):
+        """ Failing operations get an error without stopping the rest. """
+        ops = [
+            {'op': 'rename', 'id': self.first['id']},
+            {'op': 'update', 'id': 999, 'name': 'x'},
+            {'op': 'delete', 'id': self.root.id},
+            {'op': 'create', 'name': ''},
+            'delete',
+            {'op': 'create', 'name': 'factory3'},
+        ]
+
+        response = self.send_json('POST', self.url, ops)
+
+        self.assertEqual(
+            [result['status'] for result in response.json],
+            [400, 404, 400, 400, 400, 201]
+        )
+        self.assertTrue(all('error' in r for r in response.json[:5]))
+
+    def test_invalid_batch(self):
+        """ Bodies that aren't a list of operations, or too long, are 400.
+        """
+        self.app.config['MAX_BATCH_OPERATIONS'] = 2
+        ops = [{'op': 'create', 'name': f'factory{i}'} for i in range(3, 6)]
+
+        for data in ({'op': 'create', 'name': 'factory3'}, ops):
+            response = self.send_json('POST', self.url, data)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(Node.query.count(), 3)
@@ -0,0 +1,120 @@
+""" Tests of the benchmark helpers. """
+# Modules
+import unittest
+from unittest import mock
+
+# Utils
+from app import events
+from app.benchmarks import (
+    BENCH_TREE, bench_api, bench_json, drop_tree, fake_tree, percentile,
+    seed_tree
+)
+from app.cache import tree_cache
+from app.events import changes
+from app.models import Node
+from app.mirror import mirror
+from app.tests.base import BaseTestCase
+
+
+class TestPercentile(unittest.TestCase):
+    """ Percentiles use the nearest rank of the sorted samples. """
+
+    def test_median(self):
+        """ p50 is the middle sample of an odd count. """
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.5), 3)
+        self.assertEqual(percentile(list(range(1, 10)), 0.5), 5)
+
+    def test_bounds(self):
+        """ p0 is the first sample and p100 the last. """
+        self.assertEqual(percentile([1, 2, 3], 0), 1)
+        self.assertEqual(percentile([1, 2, 3], 1), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_no_samples(self):
+        """ Without samples there is no percentile. """
+        self.assertIsNone(percentile([], 0.5))
+
+
+class TestBenchJson(unittest.TestCase):
+    """ The JSON benchmark encodes trees shaped like node_list. """
+
+    def test_fake_tree(self):
+        """ Every node is nested once below a single root. """
+        def count(node):
+            return 1 + sum(map(count, node.get('children', [])))
+
+        tree, = fake_tree(25, fanout=4)
+
+        self.assertEqual(count(tree), 25)
+        self.assertEqual(len(tree['children']), 4)
+
+    def test_stdlib_is_measured(self):
+        """ The standard library is always among the results. """
+        results = bench_json(sizes=(10,), runs=2)
+
+        self.assertGreater(results[10]['json']['bytes'], 0)
+
+
+class TestBenchTree(BaseTestCase):
+    """ Seeding and dropping the benchmark tree go through the feed. """
+
+    def setUp(self):
+        """ Enables the mirror, like a worker serving the same database. """
+        super().setUp()
+        self.app.config['TREE_MIRROR'] = True
+        mirror.init_app(self.app)
+
+    def tearDown(self):
+        """ Disables the mirror, it is shared by every app. """
+        mirror.enabled = False
+        mirror.version = None
+        changes.listeners.remove(mirror.apply)
+        super().tearDown()
+
+    def children_names(self):
+        """ Returns the names of the Root's children in the mirror.
+
+        Returns:
+            list: Names of the factories.
+        """
+        mirror.sync()
+        return [node['name'] for node in mirror.root_trees()[0]['children']]
+
+    def test_seed_and_drop(self):
+        """ Both publish one change the mirror applies. """
+        version = tree_cache.current_version()
+        top = seed_tree(depth=2, fanout=3, total=13)
+
+        self.assertEqual(
+            [event['type'] for event in changes.since(version)],
+            [events.SUBTREE_REGENERATED]
+        )
+        self.assertEqual(self.children_names(), [BENCH_TREE])
+        self.assertEqual(
+            len(mirror.subtree(top.id)['children'][0]['children']), 3
+        )
+
+        drop_tree()
+
+        self.assertEqual(self.children_names(), [])
+        self.assertEqual(mirror.version, tree_cache.current_version())
+
+    def test_bench_api(self):
+        """ Every operation is measured and the tree is dropped after. """
+        count = Node.query.count()
+
+        with mock.patch('app.benchmarks.bench_startup', return_value={}):
+            results = bench_api(
+                self.app, depth=2, fanout=2, total=7, runs=3, clients=2
+            )
+
+        self.assertEqual(results['shape']['nodes'], 7)
+        self.assertEqual(set(results['results']), {
+            'get_tree', 'get_tree_cold', 'get_subtree', 'put_node',
+            'create_sub_nodes', 'update_fanout',
+        })
+        self.assertEqual(results['results']['get_tree']['runs'], 3)
+        self.assertEqual(
+            results['results']['update_fanout']['clients_reached'], 2
+        )
+        self.assertEqual(Node.query.count(), count)
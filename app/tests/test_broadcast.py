@@ -0,0 +1,71 @@
+""" Tests of the coalesced `update` broadcasts. """
+# Utils
+from app import socketio
+from app.broadcast import scheduler
+from app.tests.base import BaseTestCase
+
+
+class TestBroadcastScheduler(BaseTestCase):
+    """ Bursts of update:nodes become one broadcast, floods are dropped. """
+
+    def setUp(self):
+        """ Connects two full tree clients. """
+        super().setUp()
+        self.clients = [socketio.test_client(self.app) for _ in range(2)]
+        self.before = dict(scheduler.metrics)
+
+    def tearDown(self):
+        """ Disconnects the clients. """
+        for client in self.clients:
+            client.disconnect()
+
+        super().tearDown()
+
+    def updates(self, client):
+        """ Counts the `update` events a client received.
+
+        Args:
+            client (SocketIOTestClient): Client to read.
+
+        Returns:
+            int: Amount of `update` events.
+        """
+        return sum(
+            message['name'] == 'update' for message in client.get_received()
+        )
+
+    def metric(self, name):
+        """ Returns how much a scheduler metric grew during the test.
+
+        Args:
+            name (str): Key of `scheduler.metrics`.
+
+        Returns:
+            int: Increase of the metric.
+        """
+        return scheduler.metrics[name] - self.before[name]
+
+    def test_burst_is_merged(self):
+        """ Requests within the window share a single broadcast. """
+        self.app.config['BROADCAST_WINDOW'] = 0.1
+
+        for client in self.clients:
+            client.emit('update:nodes')
+
+        socketio.sleep(0.3)
+
+        self.assertEqual(self.metric('merged'), 1)
+        self.assertEqual(self.metric('broadcasts'), 1)
+        self.assertEqual([self.updates(c) for c in self.clients], [1, 1])
+
+    def test_client_rate_limit(self):
+        """ A client asking again within its interval is dropped. """
+        self.app.config['BROADCAST_CLIENT_INTERVAL'] = 60
+        client = self.clients[0]
+
+        client.emit('update:nodes')
+        client.emit('update:nodes')
+
+        self.assertEqual(self.metric('dropped'), 1)
+        self.assertEqual(self.metric('broadcasts'), 1)
+        self.assertEqual(self.updates(client), 1)
@@ -0,0 +1,36 @@
+""" Tests of the process caches of the Root tree. """
+# Utils
+from app.cache import tree_cache
+from app.tests.base import BaseTestCase
+
+
+class TestTreeCache(BaseTestCase):
+    """ The serialized tree is rebuilt once per tree version. """
+
+    def test_cached_until_change(self):
+        """ Repeated reads only look up the version, writes rebuild. """
+        payload, version = tree_cache.get()
+
+        self.assertEqual(self.count_statements(tree_cache.get), 1)
+        self.assertIs(tree_cache.get()[0], payload)
+
+        self.create('factory1')
+        new_payload, new_version = tree_cache.get()
+
+        self.assertGreater(new_version, version)
+        self.assertIn(b'"factory1"', new_payload)
+
+    def test_node_list_etag(self):
+        """ node_list answers 304 until the tree version moves on. """
+        etag = self.client.get('/api/nodes/').headers['ETag']
+        headers = {'If-None-Match': etag}
+
+        self.assertEqual(
+            self.client.get('/api/nodes/', headers=headers).status_code, 304
+        )
+
+        self.create('factory1')
+        response = self.client.get('/api/nodes/', headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
@@ -0,0 +1,95 @@
+""" Tests of compressed responses and broadcasts. """
+# Modules
+import gzip
+import json
+import unittest
+
+# Utils
+from app import socketio
+from app.compression import brotli
+from app.tests.base import BaseTestCase
+
+
+class TestCompression(BaseTestCase):
+    """ Large bodies are compressed as negotiated, per representation. """
+
+    def setUp(self):
+        """ Creates a tree large enough to be compressed. """
+        super().setUp()
+
+        for i in range(5):
+            node = self.create(f'factory{i}')
+            self.send_json(
+                'POST', f"/api/nodes/{node['id']}/nodes/", {'count': 10}
+            )
+
+    def get_tree(self, **headers):
+        """ Gets the whole tree.
+
+        Args:
+            **headers: Request headers, underscores for dashes.
+
+        Returns:
+            Response: Response of the app.
+        """
+        headers = {k.replace('_', '-'): v for k, v in headers.items()}
+        return self.client.get('/api/nodes/', headers=headers)
+
+    def test_gzip(self):
+        """ Clients accepting gzip get the same tree gzipped. """
+        plain = self.get_tree()
+        response = self.get_tree(Accept_Encoding='gzip')
+
+        self.assertIsNone(plain.headers.get('Content-Encoding'))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """ Clients accepting both get brotli. """
+        plain = self.get_tree()
+        response = self.get_tree(Accept_Encoding='gzip, br')
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.data), plain.data)
+
+    def test_small_bodies_stay_plain(self):
+        """ Bodies under COMPRESS_MIN_SIZE aren't worth compressing. """
+        response = self.client.get(
+            f'/api/nodes/{self.root.id}/stats/',
+            headers={'Accept-Encoding': 'gzip'}
+        )
+
+        self.assertIsNone(response.headers.get('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_etag_per_coding(self):
+        """ Each content coding has its own ETag, matched by If-None-Match. """
+        plain = self.get_tree().headers['ETag']
+        etag = self.get_tree(Accept_Encoding='gzip').headers['ETag']
+
+        self.assertNotEqual(etag, plain)
+        self.assertEqual(
+            self.get_tree(
+                Accept_Encoding='gzip', If_None_Match=etag
+            ).status_code,
+            304
+        )
+        self.assertEqual(self.get_tree(If_None_Match=etag).status_code, 200)
+
+    def test_gzip_broadcast(self):
+        """ Clients subscribed to gzip get `update` compressed. """
+        client = socketio.test_client(self.app)
+        client.emit('subscribe:gzip')
+        client.get_received()
+
+        client.emit('update:nodes')
+        updates = [
+            message['args'][0] for message in client.get_received()
+            if message['name'] == 'update'
+        ]
+        client.disconnect()
+
+        self.assertEqual(len(updates), 1)
+        trees = json.loads(gzip.decompress(updates[0]).decode('utf-8'))
+        self.assertEqual(trees, self.get_tree().json)
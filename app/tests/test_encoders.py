@@ -0,0 +1,138 @@
+""" Tests of the JSON backends and tree encodings. """
+# Modules
+import json
+import unittest
+
+from flask import Flask
+
+# Utils
+from app.encoders import JSONBackend, LOADERS, MEDIA_TYPES, msgpack
+from app.tests.base import BaseTestCase
+
+
+def backend_for(**config):
+    """ Creates a JSONBackend initialized with `config`.
+
+    Args:
+        **config: Values of the app config.
+
+    Returns:
+        JSONBackend: Initialized backend.
+    """
+    app = Flask(__name__)
+    app.config.update(config)
+    backend = JSONBackend()
+    backend.init_app(app)
+    return backend
+
+
+class TestJSONBackend(unittest.TestCase):
+    """ Every library encodes like the stdlib, missing ones fall back. """
+
+    data = {'id': 1, 'name': 'f/é', 'children': [{'id': 2}], 'max': None}
+
+    def test_backends_match_stdlib(self):
+        """ Installed libraries round trip the same values. """
+        for name in LOADERS:
+            try:
+                LOADERS[name]()
+
+            except ImportError:
+                continue
+
+            backend = backend_for(JSON_BACKEND=name)
+
+            self.assertEqual(backend.name, name)
+            self.assertEqual(json.loads(backend.dumps(self.data)), self.data)
+            self.assertEqual(
+                backend.loads(backend.dumps_bytes(self.data)), self.data
+            )
+
+    def test_unknown_backend_falls_back(self):
+        """ An unavailable library warns and uses the stdlib. """
+        with self.assertWarns(UserWarning):
+            backend = backend_for(JSON_BACKEND='simdjson')
+
+        self.assertEqual(backend.name, 'json')
+
+    def test_pretty(self):
+        """ JSON_PRETTY indents, encodings ask for compact output. """
+        backend = backend_for(JSON_BACKEND='json', JSON_PRETTY=True)
+
+        self.assertIn(b'\n', backend.dumps_bytes(self.data))
+        self.assertNotIn(b'\n', backend.dumps_bytes(self.data, pretty=False))
+
+
+class TestJSONResponses(BaseTestCase):
+    """ Responses are encoded by the configured backend. """
+
+    def test_compact_response(self):
+        """ The test config sends compact JSON. """
+        body = self.client.get('/api/nodes/').data
+
+        self.assertNotIn(b'\n', body)
+        self.assertEqual(json.loads(body)[0]['id'], self.root.id)
+
+
+class TestTreeEncodings(BaseTestCase):
+    """ The tree is sent nested or as parallel arrays, as negotiated. """
+
+    def setUp(self):
+        """ Creates a factory with two children. """
+        super().setUp()
+        self.node = self.create('factory1')
+        self.send_json(
+            'POST', f"/api/nodes/{self.node['id']}/nodes/", {'count': 2}
+        )
+
+    def get_tree(self, encoding):
+        """ Gets the whole tree in an encoding.
+
+        Args:
+            encoding (str): Key of MEDIA_TYPES.
+
+        Returns:
+            Response: Response of the app.
+        """
+        return self.client.get(
+            '/api/nodes/', headers={'Accept': MEDIA_TYPES[encoding]}
+        )
+
+    def check_columns(self, columns):
+        """ Checks parallel arrays hold the tree, parents first.
+
+        Args:
+            columns (dict): Decoded columnar tree.
+        """
+        ids = columns['id']
+
+        self.assertEqual(columns['roots'], [self.root.id])
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(columns['name']), 4)
+
+        for index, parent_id in enumerate(columns['parent_id']):
+            if parent_id is not None:
+                self.assertIn(parent_id, ids[:index])
+
+    def test_json_by_default(self):
+        """ Clients accepting anything get nested JSON. """
+        response = self.client.get('/api/nodes/', headers={'Accept': '*/*'})
+
+        self.assertEqual(response.mimetype, MEDIA_TYPES['json'])
+        self.assertEqual(response.json[0]['id'], self.root.id)
+        self.assertIn('Accept', response.headers['Vary'])
+
+    def test_columnar(self):
+        """ The columnar media type gets parallel arrays. """
+        response = self.get_tree('columnar')
+
+        self.assertEqual(response.mimetype, MEDIA_TYPES['columnar'])
+        self.check_columns(json.loads(response.data))
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        """ msgpack holds the same arrays in binary. """
+        response = self.get_tree('msgpack')
+
+        self.assertEqual(response.mimetype, MEDIA_TYPES['msgpack'])
+        self.check_columns(msgpack.unpackb(response.data, raw=False))
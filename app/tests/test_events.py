@@ -0,0 +1,76 @@
+""" Tests of the sequenced delta events. """
+# Utils
+from app import socketio
+from app import events
+from app.cache import tree_cache
+from app.tests.base import BaseTestCase
+
+
+class TestDeltas(BaseTestCase):
+    """ Subscribers get one delta per change and can catch up on gaps. """
+
+    def setUp(self):
+        """ Connects a client subscribed to deltas at the current seq. """
+        super().setUp()
+        self.seq = tree_cache.current_version()
+        self.socket_client = socketio.test_client(self.app)
+        self.socket_client.emit('subscribe:nodes', {'seq': self.seq})
+
+    def tearDown(self):
+        """ Disconnects the client. """
+        self.socket_client.disconnect()
+        super().tearDown()
+
+    def received(self, name):
+        """ Returns the first arguments of the `name` events received.
+
+        Args:
+            name (str): Value of event name.
+
+        Returns:
+            list: Event payloads.
+        """
+        return [
+            message['args'][0] for message in self.socket_client.get_received()
+            if message['name'] == name
+        ]
+
+    def test_write_sends_delta(self):
+        """ A write reaches subscribers as the next seq, not as `update`. """
+        self.assertEqual(self.received('deltas'), [[]])
+
+        node = self.create('factory1')
+        self.socket_client.emit('update:nodes')
+        messages = self.socket_client.get_received()
+        deltas = [m['args'][0] for m in messages if m['name'] == 'delta']
+
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(deltas[0]['seq'], self.seq + 1)
+        self.assertEqual(deltas[0]['type'], events.NODE_ADDED)
+        self.assertEqual(deltas[0]['node']['id'], node['id'])
+        self.assertNotIn('update', [m['name'] for m in messages])
+
+    def test_sync_replays_missed_deltas(self):
+        """ `sync:nodes` sends the deltas after the client's seq. """
+        self.create('factory1')
+        self.create('factory2')
+        self.received('delta')
+
+        self.socket_client.emit('sync:nodes', {'seq': self.seq})
+        missed, = self.received('deltas')
+
+        self.assertEqual(
+            [delta['seq'] for delta in missed],
+            [self.seq + 1, self.seq + 2]
+        )
+
+    def test_sync_without_seq_sends_snapshot(self):
+        """ Clients without a known seq get the whole tree. """
+        self.create('factory1')
+        self.received('delta')
+
+        self.socket_client.emit('sync:nodes', {'seq': None})
+        snapshot, = self.received('snapshot')
+
+        self.assertEqual(snapshot['seq'], self.seq + 1)
+        self.assertIn('"factory1"', snapshot['nodes'])
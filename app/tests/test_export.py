@@ -0,0 +1,66 @@
+""" Tests of the streamed tree export. """
+# Modules
+import json
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+def by_id(trees):
+    """ Sorts nested trees and their children by id.
+
+    Args:
+        trees (list): Nested Node dicts.
+
+    Returns:
+        list: Sorted copies of `trees`.
+    """
+    return sorted(
+        (
+            {**tree, 'children': by_id(tree['children'])}
+            if 'children' in tree else tree
+            for tree in trees
+        ),
+        key=lambda tree: tree['id']
+    )
+
+
+class TestExport(BaseTestCase):
+    """ The export nests nodes like node_list, whatever their ids. """
+
+    def setUp(self):
+        """ Creates more than ten factories, some with children. """
+        super().setUp()
+
+        for i in range(12):
+            node = self.create(f'factory{i}')
+
+            if i % 5 == 0:
+                self.send_json(
+                    'POST', f"/api/nodes/{node['id']}/nodes/", {'count': 3}
+                )
+
+    def test_json_matches_node_list(self):
+        """ Nested export holds the trees of node_list GET. """
+        trees = self.client.get('/api/nodes/').json
+        exported = json.loads(
+            self.client.get('/api/nodes/export/').get_data(as_text=True)
+        )
+
+        self.assertEqual(by_id(exported), by_id(trees))
+
+    def test_ndjson_parents_come_first(self):
+        """ Every streamed node comes after its parent. """
+        body = self.client.get('/api/nodes/export/?format=ndjson') \
+            .get_data(as_text=True)
+        seen = set()
+
+        for line in body.splitlines():
+            node = json.loads(line)
+
+            if node['parent_id'] is not None:
+                self.assertIn(node['parent_id'], seen)
+
+            seen.add(node['id'])
+
+        self.assertEqual(len(seen), 1 + 12 + 3 * 3)
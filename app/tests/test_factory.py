@@ -0,0 +1,57 @@
+""" Tests of the application factory. """
+# Modules
+import subprocess
+import sys
+import unittest
+from os.path import abspath, dirname
+
+# Utils
+from app import create_app
+from app.config import TestConfig
+from app.tests.base import BaseTestCase
+
+# Directory holding the `app` package, where the import test runs.
+PROJECT_DIR = dirname(dirname(dirname(abspath(__file__))))
+
+
+class NoDatabaseConfig(TestConfig):
+    """ Test settings without a database URL. """
+    SQLALCHEMY_DATABASE_URI = None
+
+
+class TestLazyImports(unittest.TestCase):
+    """ Importing the package stays cheap until an app is created. """
+
+    def test_import_skips_app_modules(self):
+        """ Models, views and the tree code load with `create_app`. """
+        code = (
+            'import sys, app; '
+            "print(*(m for m in ('app.models', 'app.nodes.views', "
+            "'app.tree') if m in sys.modules))"
+        )
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=PROJECT_DIR
+        )
+
+        self.assertEqual(output.strip(), b'')
+
+    def test_missing_database_url(self):
+        """ Creating an app without a database URL fails early. """
+        with self.assertRaises(RuntimeError):
+            create_app(NoDatabaseConfig)
+
+
+class TestFactory(BaseTestCase):
+    """ Every app built by the factory is complete and independent. """
+
+    def test_apps_are_independent(self):
+        """ A second app gets its own config and the same routes. """
+        other = create_app('app.config.TestConfig')
+        other.config['MAX_SUB_NODES'] = 3
+
+        self.assertEqual(self.app.config['MAX_SUB_NODES'], 15)
+        self.assertEqual(
+            sorted(rule.rule for rule in other.url_map.iter_rules()),
+            sorted(rule.rule for rule in self.app.url_map.iter_rules())
+        )
+        self.assertEqual(self.client.get('/api/nodes/').status_code, 200)
@@ -0,0 +1,38 @@
+""" Tests of the regeneration jobs. """
+# db
+from app import db
+
+# Utils
+from app.cache import root_cache
+from app.jobs import regeneration_targets
+from app.tests.base import BaseTestCase
+
+
+class TestRegenerationJobs(BaseTestCase):
+    """ Picking the regenerated nodes and starting jobs. """
+
+    def test_nested_targets_are_skipped(self):
+        """ Factories below another factory aren't separate targets. """
+        ids = [self.create(f'factory{i}')['id'] for i in range(12)]
+
+        for child in ids[8:]:
+            response = self.send_json(
+                'POST', f'/api/nodes/{child}/move/', {'parent_id': ids[1]}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        targets = regeneration_targets(self.root)
+
+        self.assertEqual(sorted(targets), ids[:8])
+
+    def test_missing_root(self):
+        """ Regenerating the whole tree without a Root returns 404. """
+        db.session.delete(self.root)
+        db.session.commit()
+        root_cache.invalidate()
+
+        response = self.send_json(
+            'POST', '/api/nodes/regenerate/', {'count': 2}
+        )
+
+        self.assertEqual(response.status_code, 404)
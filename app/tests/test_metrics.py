@@ -0,0 +1,74 @@
+""" Tests of the request and SQL instrumentation. """
+# Utils
+from app.metrics import Histogram
+from app.tests.base import BaseTestCase
+
+
+class TestMetrics(BaseTestCase):
+    """ Requests are timed and exposed in the Prometheus text format. """
+
+    def sample(self, name):
+        """ Reads a sample from the metrics endpoint.
+
+        Args:
+            name (str): Value of sample name with its labels.
+
+        Returns:
+            float: Value of the sample, 0 if it isn't exposed yet.
+        """
+        body = self.client.get('/api/nodes/metrics/').get_data(as_text=True)
+
+        for line in body.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.split(' ')[-1])
+
+        return 0
+
+    def test_histogram_render(self):
+        """ Buckets are cumulative and every series has a sum and count. """
+        histogram = Histogram(
+            'test_seconds', 'Test.', labels=('kind',), buckets=(1, 5)
+        )
+
+        for value in (0.5, 2, 9):
+            histogram.observe(value, kind='a')
+
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{kind="a",le="1"} 1',
+            'test_seconds_bucket{kind="a",le="5"} 2',
+            'test_seconds_bucket{kind="a",le="+Inf"} 3',
+            'test_seconds_sum{kind="a"} 11.5',
+            'test_seconds_count{kind="a"} 3',
+        ])
+
+    def test_requests_are_counted(self):
+        """ Each request adds to its endpoint's latency and SQL series. """
+        labels = '{endpoint="node.node_list",method="GET"}'
+        requests = self.sample('nodes_request_seconds_count' + labels)
+        statements = self.sample('nodes_request_sql_statements_sum' + labels)
+
+        self.client.get('/api/nodes/')
+
+        self.assertEqual(
+            self.sample('nodes_request_seconds_count' + labels), requests + 1
+        )
+        self.assertGreater(
+            self.sample('nodes_request_sql_statements_sum' + labels),
+            statements
+        )
+
+    def test_server_timing(self):
+        """ With SERVER_TIMING the breakdown is sent in a header. """
+        self.assertNotIn(
+            'Server-Timing', self.client.get('/api/nodes/').headers
+        )
+
+        self.app.config['SERVER_TIMING'] = True
+        self.create('factory1')
+        timing = self.client.get('/api/nodes/').headers['Server-Timing']
+
+        self.assertTrue(timing.startswith('db;dur='))
+        self.assertIn('serialize-tree;dur=', timing)
+        self.assertIn('total;dur=', timing)
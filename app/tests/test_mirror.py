@@ -0,0 +1,45 @@
+""" Tests of the in-memory tree mirror. """
+# db
+from app import db
+from app.models import Node
+
+# Utils
+from app.cache import root_cache, tree_cache
+from app.events import changes
+from app.mirror import mirror
+from app.tests.base import BaseTestCase
+
+
+class TestMirror(BaseTestCase):
+    """ The mirror loads with the app and follows published changes. """
+
+    def setUp(self):
+        """ Enables the mirror once the tables and the Root exist. """
+        super().setUp()
+        self.root_id, self.root_name = self.root.id, self.root.name
+        self.app.config['TREE_MIRROR'] = True
+        mirror.init_app(self.app)
+
+    def tearDown(self):
+        """ Disables the mirror, it is shared by every app. """
+        mirror.enabled = False
+        mirror.version = None
+        changes.listeners.remove(mirror.apply)
+        super().tearDown()
+
+    def test_loaded_at_startup(self):
+        """ The tree is in memory before any request. """
+        self.assertEqual(mirror.version, tree_cache.current_version())
+        self.assertEqual(mirror.subtree(self.root_id)['name'], self.root_name)
+
+    def test_new_root_reaches_mirror(self):
+        """ A Root created after the load is published to the mirror. """
+        db.session.delete(Node.query.get(self.root_id))
+        db.session.commit()
+        root_cache.invalidate()
+        mirror.init_app(self.app)
+
+        root = Node.create_root()
+
+        self.assertEqual(mirror.version, tree_cache.current_version())
+        self.assertEqual(mirror.root_trees()[0]['id'], root.id)
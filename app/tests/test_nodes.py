@@ -0,0 +1,95 @@
+""" Tests of the unique factory names backed by `uq_node_name`. """
+# db
+from app.models import Node
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestUniqueNames(BaseTestCase):
+    """ Creating or renaming a factory to a taken name is rejected. """
+
+    def setUp(self):
+        """ Creates two factories under the Root. """
+        super().setUp()
+        self.first = self.create('factory1')
+        self.second = self.create('factory2')
+
+    def rename(self, node, name):
+        """ Builds the update data renaming `node`.
+
+        Args:
+            node (dict): Serialized Node to rename.
+            name (str): Value of the new name.
+
+        Returns:
+            dict: Update data with the node's numbers.
+        """
+        return {
+            'name':    name,
+            'min_num': node['min_num'],
+            'max_num': node['max_num'],
+        }
+
+    def test_create_taken_name(self):
+        """ Creating a second factory with a taken name returns 400. """
+        response = self.send_json('POST', '/api/nodes/', {'name': 'factory1'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Node.query.filter_by(name='factory1').count(), 1)
+
+    def test_upsert_returns_existing(self):
+        """ Upserting a taken name returns the existing Node. """
+        pk, created = Node.upsert('factory1', parent_id=self.root.id)
+
+        self.assertFalse(created)
+        self.assertEqual(pk, self.first['id'])
+
+    def test_rename_to_taken_name(self):
+        """ Renaming a factory to a taken name returns 400. """
+        response = self.send_json(
+            'PUT', f"/api/nodes/{self.second['id']}/",
+            self.rename(self.second, 'factory1')
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            Node.query.get(self.second['id']).name, 'factory2'
+        )
+
+    def test_rename_keeps_own_name(self):
+        """ Sending a factory's own name along with new numbers is valid. """
+        response = self.send_json(
+            'PUT', f"/api/nodes/{self.first['id']}/",
+            self.rename(self.first, 'factory1')
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_rename_to_taken_name(self):
+        """ A batch update to a taken name fails only that operation. """
+        op = self.rename(self.second, 'factory1')
+        op.update({'op': 'update', 'id': self.second['id']})
+        create = {'op': 'create', 'name': 'factory4'}
+        response = self.send_json('POST', '/api/nodes/batch/', [op, create])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json[0]['status'], 400)
+        self.assertEqual(response.json[1]['status'], 201)
+
+    def test_batch_renames_to_same_name(self):
+        """ Only the first of two updates taking the same name applies. """
+        ops = []
+
+        for node in (self.first, self.second):
+            op = self.rename(node, 'factory3')
+            op.update({'op': 'update', 'id': node['id']})
+            ops.append(op)
+
+        response = self.send_json('POST', '/api/nodes/batch/', ops)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.json], [200, 400]
+        )
+        self.assertEqual(Node.query.filter_by(name='factory3').count(), 1)
@@ -0,0 +1,74 @@
+""" Tests of the depth and page limited tree reads. """
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestTreePaging(BaseTestCase):
+    """ depth, limit and after cut the tree, children_count shows the rest. """
+
+    def setUp(self):
+        """ Creates four factories with three children each. """
+        super().setUp()
+        self.ids = []
+
+        for i in range(4):
+            node = self.create(f'factory{i}')
+            self.send_json(
+                'POST', f"/api/nodes/{node['id']}/nodes/", {'count': 3}
+            )
+            self.ids.append(node['id'])
+
+    def get(self, url, **args):
+        """ Gets `url` with the query parameters `args`.
+
+        Args:
+            url (str): Value of url to request.
+            **args: Query parameters.
+
+        Returns:
+            Response: Response of the app.
+        """
+        return self.client.get(url, query_string=args)
+
+    def test_depth(self):
+        """ Nodes at the last level have empty children and their count. """
+        root, = self.get('/api/nodes/', depth=1).json
+
+        self.assertEqual(root['children_count'], 4)
+        self.assertEqual(
+            [node['id'] for node in root['children']], self.ids
+        )
+
+        for node in root['children']:
+            self.assertEqual(node['children'], [])
+            self.assertEqual(node['children_count'], 3)
+
+    def test_limit_and_after(self):
+        """ limit caps children per node, after pages the root's children.
+        """
+        root, = self.get('/api/nodes/', limit=2).json
+        page, = self.get('/api/nodes/', limit=2, after=self.ids[1]).json
+
+        self.assertEqual(
+            [node['id'] for node in root['children']], self.ids[:2]
+        )
+        self.assertEqual(
+            [node['id'] for node in page['children']], self.ids[2:]
+        )
+        self.assertEqual(len(root['children'][0]['children']), 2)
+        self.assertEqual(root['children_count'], 4)
+
+    def test_node_detail(self):
+        """ Subtree reads accept the same parameters. """
+        url = f'/api/nodes/{self.ids[0]}/'
+        node = self.get(url, depth=0).json
+
+        self.assertEqual(node['id'], self.ids[0])
+        self.assertEqual(node['children'], [])
+        self.assertEqual(node['children_count'], 3)
+
+    def test_invalid_values(self):
+        """ Negative, non numeric or zero limits return 400. """
+        for args in ({'depth': -1}, {'after': 'x'}, {'limit': 0}):
+            response = self.get('/api/nodes/', **args)
+            self.assertEqual(response.status_code, 400)
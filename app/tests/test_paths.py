@@ -0,0 +1,97 @@
+""" Tests of the materialized Node paths. """
+# db
+from app import db
+from app.models import Node
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestPaths(BaseTestCase):
+    """ Every write path keeps `Node.path` in line with the parents. """
+
+    def test_orm_inserts(self):
+        """ Nodes added through the ORM get paths below their parents. """
+        factory = Node('factory1')
+        factory.parent_id = self.root.id
+        children = [Node(f'child{i}') for i in range(3)]
+
+        for child in children:
+            child.parent = factory
+
+        db.session.add_all([factory] + children)
+        db.session.commit()
+
+        self.assertEqual(factory.path, f'{self.root.id}/{factory.id}/')
+
+        for child in children:
+            self.assertEqual(child.path, f'{factory.path}{child.id}/')
+            self.assertEqual(
+                child.ancestor_ids, [self.root.id, factory.id]
+            )
+
+    def test_orm_inserts_fill_paths_per_parent(self):
+        """ Paths cost a constant amount of statements, not one per row. """
+        factory = Node.query.get(self.create('factory1')['id'])
+
+        def insert(count):
+            for i in range(count):
+                child = Node(f'child{i}')
+                child.can_have_children = False
+                child.parent_id = factory.id
+                db.session.add(child)
+
+            db.session.flush()
+
+        few = self.count_statements(lambda: insert(2))
+        many = self.count_statements(lambda: insert(12))
+
+        self.assertEqual(many - few, 10)
+
+    def test_moved_subtree(self):
+        """ A move rewrites the paths of the whole subtree. """
+        first = self.create('factory1')
+        second = self.create('factory2')
+        self.send_json(
+            'POST', f"/api/nodes/{first['id']}/nodes/", {'count': 3}
+        )
+        self.send_json(
+            'POST', f"/api/nodes/{first['id']}/move/",
+            {'parent_id': second['id']}
+        )
+
+        prefix = f"{self.root.id}/{second['id']}/{first['id']}/"
+        paths = [
+            node.path for node in Node.query.filter_by(parent_id=first['id'])
+        ]
+
+        self.assertEqual(len(paths), 3)
+        self.assertTrue(all(path.startswith(prefix) for path in paths))
+
+    def test_api_writes(self):
+        """ Created factories and regenerated children get their paths. """
+        factory = self.create('factory1')
+        self.send_json(
+            'POST', f"/api/nodes/{factory['id']}/nodes/", {'count': 3}
+        )
+        node = Node.query.get(factory['id'])
+
+        self.assertEqual(node.path, f"{self.root.id}/{factory['id']}/")
+        self.assertEqual(node.descendants_count(), 3)
+        self.assertEqual(self.root.descendants_count(), 4)
+
+    def test_delete_removes_subtree(self):
+        """ Deleting a node removes every descendant by path. """
+        first = self.create('factory1')
+        second = self.create('factory2')
+        self.send_json(
+            'POST', f"/api/nodes/{second['id']}/nodes/", {'count': 3}
+        )
+        self.send_json(
+            'POST', f"/api/nodes/{second['id']}/move/",
+            {'parent_id': first['id']}
+        )
+
+        self.client.delete(f"/api/nodes/{first['id']}/")
+
+        self.assertEqual(Node.query.count(), 1)
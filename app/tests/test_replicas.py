@@ -0,0 +1,63 @@
+""" Tests of the read replica routing. """
+# db
+from app import db
+from app.models import Node
+
+# Utils
+from app.database import PRIMARY_COOKIE
+from app.tests.base import BaseTestCase
+
+
+class TestReplicaRouting(BaseTestCase):
+    """ Safe requests read a replica unless the client just wrote. """
+
+    def create_app(self):
+        """ Creates the app with an in-memory replica.
+
+        Returns:
+            Flask: Application under test.
+        """
+        app = super().create_app()
+        app.config['SQLALCHEMY_BINDS'] = {'replica_0': 'sqlite://'}
+        return app
+
+    def setUp(self):
+        """ Creates the replica tables, holding a renamed copy of a node. """
+        super().setUp()
+        self.node = Node('factory1')
+        self.node.parent_id = self.root.id
+        db.session.add(self.node)
+        db.session.commit()
+
+        replica = db.get_engine(self.app, bind='replica_0')
+        db.Model.metadata.create_all(replica)
+        replica.execute(Node.__table__.insert(), {
+            'id':      self.node.id,
+            'name':    'lagging',
+            'path':    self.node.path,
+            'min_num': self.node.min_num,
+            'max_num': self.node.max_num,
+        })
+
+    def test_reads_use_replica(self):
+        """ GETs of a client that didn't write come from the replica. """
+        response = self.client.get(f'/api/nodes/{self.node.id}/')
+
+        self.assertEqual(response.json['name'], 'lagging')
+        self.assertNotIn('Set-Cookie', response.headers)
+
+    def test_writer_reads_primary(self):
+        """ A write pins the client to the primary for its next reads. """
+        response = self.send_json('POST', '/api/nodes/', {'name': 'factory2'})
+        detail = self.client.get(f'/api/nodes/{self.node.id}/')
+
+        self.assertIn(PRIMARY_COOKIE, response.headers['Set-Cookie'])
+        self.assertEqual(detail.json['name'], 'factory1')
+
+    def test_tree_waits_for_replica(self):
+        """ The cached tree isn't built from a replica behind the version.
+        """
+        trees = self.client.get('/api/nodes/').json
+        names = [node['name'] for node in trees[0]['children']]
+
+        self.assertEqual(names, ['factory1'])
@@ -0,0 +1,41 @@
+""" Tests of the flagged tree root and its cached id. """
+# db
+from app.models import Node
+
+# Utils
+from app.cache import root_cache
+from app.tests.base import BaseTestCase
+
+
+class TestRoot(BaseTestCase):
+    """ The Root is found by its flag, its id is looked up once. """
+
+    def test_create_root_is_idempotent(self):
+        """ A second create_root returns the existing Root. """
+        root = Node.create_root('Other')
+
+        self.assertEqual(root.id, self.root.id)
+        self.assertEqual(Node.query.filter_by(is_root=True).count(), 1)
+
+    def test_id_is_cached(self):
+        """ Only the first lookup of the root id queries the DB. """
+        root_cache.invalidate()
+
+        self.assertEqual(self.count_statements(root_cache.get), 1)
+        self.assertEqual(self.count_statements(root_cache.get), 0)
+        self.assertEqual(root_cache.get(), self.root.id)
+
+    def test_renamed_root(self):
+        """ Renaming the Root doesn't lose the tree or new factories. """
+        data = {
+            'name':    'Plant',
+            'min_num': self.root.min_num,
+            'max_num': self.root.max_num,
+        }
+        response = self.send_json('PUT', f'/api/nodes/{self.root.id}/', data)
+        factory = self.create('factory1')
+        root, = self.client.get('/api/nodes/').json
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((root['id'], root['name']), (self.root.id, 'Plant'))
+        self.assertEqual(factory['parent_id'], self.root.id)
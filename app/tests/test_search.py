@@ -0,0 +1,103 @@
+""" Tests of the node search endpoint. """
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestSearch(BaseTestCase):
+    """ Nodes are found by name and range, with their ancestors. """
+
+    def setUp(self):
+        """ Creates factories with known names and ranges. """
+        super().setUp()
+        self.ids = {}
+
+        for name, min_num, max_num in (('alpha', 10, 20),
+                                       ('alphabet', 15, 40),
+                                       ('ab_cd', 50, 60),
+                                       ('abcde', 70, 80)):
+            node = self.create(name)
+            self.send_json('PUT', f"/api/nodes/{node['id']}/", {
+                'name': name, 'min_num': min_num, 'max_num': max_num
+            })
+            self.ids[name] = node['id']
+
+    def search(self, status=200, **args):
+        """ Searches with the query parameters `args`.
+
+        Args:
+            status (int): Expected status code.
+            **args: Query parameters.
+
+        Returns:
+            dict: Decoded response body.
+        """
+        response = self.client.get('/api/nodes/search/', query_string=args)
+        self.assertEqual(response.status_code, status)
+        return response.json
+
+    def names(self, **args):
+        """ Searches and returns the names of the matches.
+
+        Args:
+            **args: Query parameters.
+
+        Returns:
+            list: Names of the matches, ordered by id.
+        """
+        return [node['name'] for node in self.search(**args)['results']]
+
+    def test_name(self):
+        """ Names match by prefix, or anywhere with match=contains. """
+        self.assertEqual(self.names(name='alpha'), ['alpha', 'alphabet'])
+        self.assertEqual(
+            self.names(name='bet', match='contains'), ['alphabet']
+        )
+
+    def test_wildcards_are_literal(self):
+        """ LIKE wildcards in the name only match themselves. """
+        self.assertEqual(self.names(name='ab_'), ['ab_cd'])
+        self.assertEqual(self.names(name='%', match='contains'), [])
+
+    def test_ranges(self):
+        """ contains matches ranges holding N, min / max overlapping ones.
+        """
+        self.assertEqual(self.names(contains=18), ['alpha', 'alphabet'])
+        self.assertEqual(
+            self.names(min_num=30, max_num=55), ['alphabet', 'ab_cd']
+        )
+        self.assertEqual(self.names(name='a', max_num=12), ['alpha'])
+
+    def test_root_and_ancestors(self):
+        """ root restricts the search to a subtree, ancestors are listed.
+        """
+        self.send_json(
+            'POST', f"/api/nodes/{self.ids['alphabet']}/move/",
+            {'parent_id': self.ids['abcde']}
+        )
+
+        match, = self.search(name='alpha', root=self.ids['abcde'])['results']
+
+        self.assertEqual(match['id'], self.ids['alphabet'])
+        self.assertEqual(
+            match['ancestor_ids'], [self.root.id, self.ids['abcde']]
+        )
+
+    def test_paging(self):
+        """ next is the after value of the following page. """
+        first = self.search(name='a', limit=3)
+        second = self.search(name='a', limit=3, after=first['next'])
+
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual(
+            [node['name'] for node in second['results']], ['abcde']
+        )
+        self.assertIsNone(second['next'])
+
+    def test_invalid_args(self):
+        """ Missing filters or bad values are 400, unknown roots 404. """
+        self.search(400)
+        self.search(400, name='')
+        self.search(400, name='a', match='suffix')
+        self.search(400, contains=5, min_num=1)
+        self.search(400, name='a', limit=101)
+        self.search(404, name='a', root=999)
@@ -0,0 +1,113 @@
+""" Tests of broadcasts shared by workers through a message queue. """
+# Modules
+from uuid import uuid4
+
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+
+# Utils
+from app import socketio
+from app import events
+from app.sockets import LOCAL_QUEUE, LocalManager, socketio_options
+from app.tests.base import BaseTestCase
+
+
+def use_local_queue(server, client, channel):
+    """ Moves a test client's server onto the in-process message queue.
+
+    Notes:
+        Recent Flask-SocketIO versions refuse to create test clients for a
+        server using a queue, so the queue is attached once the client
+        exists and the client reconnects through it.
+
+    Args:
+        server (SocketIO): Extension whose server gets the queue.
+        client (SocketIOTestClient): Client of that server.
+        channel (str): Value of queue channel, shared by the workers.
+    """
+    client.disconnect()
+    manager = LocalManager(channel=channel)
+    manager.set_server(server.server)
+    manager.initialize()
+    server.server.manager = manager
+    client.connect()
+
+
+class TestLocalQueue(BaseTestCase):
+    """ Two workers sharing the `local://` stand-in of Redis. """
+
+    def setUp(self):
+        """ Connects a client to the app and to a second worker. """
+        super().setUp()
+        self.worker = Flask('worker')
+        self.worker_socketio = SocketIO(self.worker)
+
+        @self.worker_socketio.on('connect')
+        def join_rooms():
+            join_room(events.FULL_ROOM)
+            join_room(events.DELTA_ROOM)
+
+        channel = f'test-{uuid4().hex}'
+        self.socket_client = socketio.test_client(self.app)
+        self.worker_client = self.worker_socketio.test_client(self.worker)
+        use_local_queue(socketio, self.socket_client, channel)
+        use_local_queue(self.worker_socketio, self.worker_client, channel)
+        self.socket_client.get_received()
+        self.worker_client.get_received()
+
+    def tearDown(self):
+        """ Disconnects both clients. """
+        self.socket_client.disconnect()
+        self.worker_client.disconnect()
+        super().tearDown()
+
+    def received(self, client, name):
+        """ Waits for the queue to deliver `name` events to `client`.
+
+        Args:
+            client (SocketIOTestClient): Client to read.
+            name (str): Value of event name.
+
+        Returns:
+            list: Arguments of the received events.
+        """
+        for attempt in range(40):
+            messages = [
+                message['args'] for message in client.get_received()
+                if message['name'] == name
+            ]
+
+            if messages:
+                return messages
+
+            socketio.sleep(0.05)
+
+        return []
+
+    def test_options_select_local_queue(self):
+        """ `local://` makes every server of the process share a channel. """
+        options = socketio_options({'SOCKETIO_MESSAGE_QUEUE': LOCAL_QUEUE})
+
+        self.assertIsInstance(options['client_manager'], LocalManager)
+
+    def test_broadcast_reaches_other_worker(self):
+        """ A full tree broadcast of one worker reaches the other's client.
+        """
+        self.socket_client.emit('update:nodes')
+
+        updates = self.received(self.worker_client, 'update')
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"name":"Root"', updates[0][0])
+
+    def test_delta_reaches_other_worker(self):
+        """ A change published by one worker reaches the other's client. """
+        response = self.send_json(
+            'POST', '/api/nodes/', {'name': 'factory1'}
+        )
+        deltas = self.received(self.worker_client, 'delta')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(deltas[0][0]['type'], events.NODE_ADDED)
+        self.assertEqual(deltas[0][0]['node']['name'], 'factory1')
@@ -0,0 +1,75 @@
+""" Tests of the subtree statistics endpoint. """
+# db
+from app.models import Node
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestStats(BaseTestCase):
+    """ Counts and range aggregates of a subtree, cached per version. """
+
+    def setUp(self):
+        """ Creates a factory holding a factory with three children. """
+        super().setUp()
+        self.outer = self.create('factory1')
+        self.inner = self.create('factory2')
+        self.send_json(
+            'POST', f"/api/nodes/{self.inner['id']}/nodes/", {'count': 3}
+        )
+        self.send_json(
+            'POST', f"/api/nodes/{self.inner['id']}/move/",
+            {'parent_id': self.outer['id']}
+        )
+        self.url = f"/api/nodes/{self.outer['id']}/stats/"
+
+    def test_subtree_stats(self):
+        """ Descendants, leaves, depth and ranges cover the subtree. """
+        stats = self.client.get(self.url).json
+        nodes = Node.query.filter(Node.id != self.outer['id']) \
+            .filter(Node.id != self.root.id).all()
+        min_nums = [node.min_num for node in nodes]
+
+        self.assertEqual(stats['id'], self.outer['id'])
+        self.assertEqual(
+            (stats['descendants'], stats['leaves'], stats['depth']),
+            (4, 3, 2)
+        )
+        self.assertEqual(stats['min_num']['min'], min(min_nums))
+        self.assertEqual(stats['min_num']['max'], max(min_nums))
+        self.assertAlmostEqual(
+            stats['min_num']['avg'], sum(min_nums) / len(min_nums)
+        )
+
+    def test_leaf_and_root(self):
+        """ Leaves have empty stats, no id describes the whole tree. """
+        leaf = Node.query.filter_by(parent_id=self.inner['id']).first()
+        stats = self.client.get(f'/api/nodes/{leaf.id}/stats/').json
+        root = self.client.get('/api/nodes/stats/').json
+
+        self.assertEqual((stats['descendants'], stats['depth']), (0, 0))
+        self.assertIsNone(stats['max_num']['avg'])
+        self.assertEqual((root['id'], root['descendants']), (self.root.id, 5))
+
+    def test_etag_follows_tree_version(self):
+        """ Stats answer 304 until a write changes the tree. """
+        etag = self.client.get(self.url).headers['ETag']
+        headers = {'If-None-Match': etag}
+
+        self.assertEqual(
+            self.client.get(self.url, headers=headers).status_code, 304
+        )
+
+        self.send_json(
+            'POST', f"/api/nodes/{self.inner['id']}/nodes/", {'count': 5}
+        )
+        response = self.client.get(self.url, headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['descendants'], 6)
+
+    def test_missing_node(self):
+        """ Unknown or malformed ids return 404. """
+        for pk in ('999', 'abc'):
+            response = self.client.get(f'/api/nodes/{pk}/stats/')
+            self.assertEqual(response.status_code, 404)
@@ -0,0 +1,69 @@
+""" Tests of the bulk regeneration of sub nodes. """
+# db
+from app.models import Node
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestSubNodes(BaseTestCase):
+    """ create_sub_nodes replaces children with bulk statements. """
+
+    def setUp(self):
+        """ Creates a factory under the Root. """
+        super().setUp()
+        self.node = self.create('factory1')
+        self.url = f"/api/nodes/{self.node['id']}/nodes/"
+
+    def children(self):
+        """ Returns the current children of the factory.
+
+        Returns:
+            list: Child Nodes.
+        """
+        return Node.query.filter_by(parent_id=self.node['id']).all()
+
+    def test_children_are_replaced(self):
+        """ Each request swaps the children for new leaves in range. """
+        self.send_json('POST', self.url, {'count': 5})
+
+        response = self.send_json('POST', self.url, {'count': 3})
+        children = self.children()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(children), 3)
+        self.assertEqual(Node.query.count(), 2 + 3)
+
+        for child in children:
+            self.assertFalse(child.can_have_children)
+            self.assertTrue(
+                self.node['min_num'] <= int(child.name) <=
+                self.node['max_num']
+            )
+            self.assertEqual(child.ancestor_ids[-1], self.node['id'])
+
+    def test_statements_dont_grow_with_count(self):
+        """ Regenerating costs the same statements for any count. """
+        def regenerate(count):
+            return lambda: self.send_json('POST', self.url, {'count': count})
+
+        self.assertEqual(
+            self.count_statements(regenerate(1)),
+            self.count_statements(regenerate(15))
+        )
+
+    def test_invalid_count(self):
+        """ Missing or out of range counts return 400. """
+        for data in ({}, {'count': 'five'}, {'count': -1}, {'count': 16}):
+            response = self.send_json('POST', self.url, data)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.children(), [])
+
+    def test_missing_parent(self):
+        """ Regenerating below an unknown node returns 404. """
+        response = self.send_json(
+            'POST', '/api/nodes/999/nodes/', {'count': 3}
+        )
+
+        self.assertEqual(response.status_code, 404)
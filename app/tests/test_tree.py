@@ -0,0 +1,52 @@
+""" Tests of the single query tree loader. """
+# db
+from app.models import Node
+
+# Utils
+from app.tests.base import BaseTestCase
+
+
+class TestTreeLoader(BaseTestCase):
+    """ Subtrees are nested in memory from one range scan. """
+
+    def setUp(self):
+        """ Creates two factories with children, one below the other. """
+        super().setUp()
+        self.first = self.create('factory1')
+        self.second = self.create('factory2')
+
+        for node in (self.first, self.second):
+            self.send_json(
+                'POST', f"/api/nodes/{node['id']}/nodes/", {'count': 3}
+            )
+
+        self.send_json(
+            'POST', f"/api/nodes/{self.second['id']}/move/",
+            {'parent_id': self.first['id']}
+        )
+
+    def test_node_list_nests_subtrees(self):
+        """ node_list holds every level, children ordered by id. """
+        root, = self.client.get('/api/nodes/').json
+        first, = root['children']
+        ids = [child['id'] for child in first['children']]
+        second, = [
+            child for child in first['children']
+            if child['id'] == self.second['id']
+        ]
+
+        self.assertEqual(root['id'], self.root.id)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(second['children']), 3)
+        self.assertNotIn('children', second['children'][0])
+
+    def test_serialize_is_one_query(self):
+        """ Serializing costs the same statements whatever the depth. """
+        root = Node.query.get(self.root.id)
+        leaf = Node.query.filter_by(parent_id=self.second['id']).first()
+
+        self.assertEqual(
+            self.count_statements(lambda: root.serialize),
+            self.count_statements(lambda: leaf.serialize)
+        )
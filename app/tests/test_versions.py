@@ -0,0 +1,270 @@
+""" Tests of Node versions, If-Match and the subtree ETags. """
+# Modules
+from unittest import mock
+
+# db
+from app import db
+from app.models import Node
+
+# Utils
+from app.helper_functions import check_if_match, validate_update
+from app.tests.base import BaseTestCase
+
+
+def write_row(node):
+    """ Bumps the version of a row like a concurrent writer.
+
+    Notes:
+        The ORM doesn't see the UPDATE, so the request still writes the
+        version it read, as if another request committed in between.
+
+    Args:
+        node (Node): Node the request writes.
+    """
+    table = Node.__table__
+    db.session.execute(
+        table.update().where(table.c.id == node.id)
+        .values(version=table.c.version + 1)
+    )
+
+
+def write_behind(node, if_match):
+    """ Checks If-Match, then writes the row behind the request's back.
+
+    Args:
+        node (Node): Node the request writes.
+        if_match (ETags): Parsed If-Match header of the request.
+    """
+    check_if_match(node, if_match)
+    write_row(node)
+
+
+def before_lock(change):
+    """ Returns a `Node.bump_version` that first runs `change(node)`.
+
+    Args:
+        change (function): Concurrent write, e.g. `write_row`.
+
+    Returns:
+        function: Replacement of `Node.bump_version`.
+    """
+    bump_version = Node.bump_version
+
+    def bump(node, expected=None):
+        change(node)
+        return bump_version(node, expected)
+
+    return bump
+
+
+def move_to(parent_id):
+    """ Returns a concurrent write moving a node below `parent_id`.
+
+    Notes:
+        The move goes through Core, so the loaded Node keeps its old path,
+        as if another request moved it after this one read it.
+
+    Args:
+        parent_id (int): Id of the new parent.
+
+    Returns:
+        function: Write for `before_lock`.
+    """
+    return lambda node: Node.move(node, Node.query.get(parent_id))
+
+
+class TestVersions(BaseTestCase):
+    """ Writes apply to the version read, stale ones are rejected. """
+
+    def setUp(self):
+        """ Creates a factory under the Root. """
+        super().setUp()
+        self.node = self.create('factory1')
+        self.url = f"/api/nodes/{self.node['id']}/"
+
+    def update(self, headers=None, **data):
+        """ Sends a PUT for the factory.
+
+        Args:
+            headers (dict): Extra request headers, e.g. If-Match.
+            **data: Values overriding the factory's current ones.
+
+        Returns:
+            Response: Response of the app.
+        """
+        body = {
+            'name':    self.node['name'],
+            'min_num': self.node['min_num'],
+            'max_num': self.node['max_num'],
+        }
+        body.update(data)
+        return self.send_json('PUT', self.url, body, headers)
+
+    def test_put_increments_version(self):
+        """ Each update returns the next version in X-Node-Version. """
+        self.assertEqual(
+            self.client.get(self.url).headers['X-Node-Version'], '1'
+        )
+
+        response = self.update(name='factory2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Node-Version'], '2')
+
+    def test_put_if_match(self):
+        """ A matching If-Match updates, a stale one returns 412. """
+        response = self.update({'If-Match': '"1"'}, name='factory2')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.update({'If-Match': '"1"'}, name='factory3')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Node.query.get(self.node['id']).name, 'factory2')
+
+    def test_delete_if_match(self):
+        """ Deleting with a stale If-Match returns 412. """
+        response = self.client.delete(self.url, headers={'If-Match': '"7"'})
+
+        self.assertEqual(response.status_code, 412)
+        self.assertIsNotNone(Node.query.get(self.node['id']))
+
+    def test_put_concurrent_write(self):
+        """ An update racing another write returns 409. """
+        with mock.patch(
+                'app.nodes.views.check_if_match', side_effect=write_behind):
+            response = self.update(name='factory2')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Node.query.get(self.node['id']).name, 'factory1')
+
+    def test_delete_concurrent_write(self):
+        """ A delete racing another write returns 409. """
+        with mock.patch(
+                'app.nodes.views.check_if_match', side_effect=write_behind):
+            response = self.client.delete(self.url)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIsNotNone(Node.query.get(self.node['id']))
+
+    def test_batch_stale_version(self):
+        """ Batch operations expecting an old version return 409. """
+        self.update(name='factory2')
+        ops = [
+            {'op': 'delete', 'id': self.node['id'], 'version': 1},
+            {'op': 'delete', 'id': self.node['id'], 'version': 2},
+        ]
+
+        response = self.send_json('POST', '/api/nodes/batch/', ops)
+
+        self.assertEqual(
+            [result['status'] for result in response.json], [409, 204]
+        )
+
+    def test_regenerate_after_move(self):
+        """ Children are replaced under the path the node has once locked. """
+        url = self.url + 'nodes/'
+        self.send_json('POST', url, {'count': 3})
+        other = self.create('factory2')
+
+        bump = before_lock(move_to(other['id']))
+
+        with mock.patch.object(Node, 'bump_version', side_effect=bump):
+            response = self.send_json('POST', url, {'count': 2})
+
+        node = Node.query.get(self.node['id'])
+        subtree = Node.query.filter(Node.path.like(node.path + '%'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(node.ancestor_ids[-1], other['id'])
+        self.assertEqual(subtree.count(), 3)
+        self.assertEqual(Node.query.filter_by(parent_id=node.id).count(), 2)
+
+    def test_batch_delete_concurrent_write(self):
+        """ A batch delete racing another write fails that operation. """
+        ops = [{'op': 'delete', 'id': self.node['id']}]
+        bump = before_lock(write_row)
+
+        with mock.patch.object(Node, 'bump_version', side_effect=bump):
+            response = self.send_json('POST', '/api/nodes/batch/', ops)
+
+        self.assertEqual(response.json[0]['status'], 409)
+        self.assertIsNotNone(Node.query.get(self.node['id']))
+
+    def test_batch_delete_after_ancestor_move(self):
+        """ A batch delete removes the subtree at its locked path. """
+        other = self.create('factory2')
+        child = self.create('factory3')
+        self.send_json(
+            'POST', f"/api/nodes/{child['id']}/move/",
+            {'parent_id': self.node['id']}
+        )
+        self.send_json(
+            'POST', f"/api/nodes/{child['id']}/nodes/", {'count': 3}
+        )
+        ops = [{'op': 'delete', 'id': child['id']}]
+        move = move_to(other['id'])
+        bump = before_lock(lambda node: move(Node.query.get(self.node['id'])))
+
+        with mock.patch.object(Node, 'bump_version', side_effect=bump):
+            response = self.send_json('POST', '/api/nodes/batch/', ops)
+
+        self.assertEqual(response.json[0]['status'], 204)
+        self.assertEqual(Node.query.count(), 3)
+
+    def test_batch_conflict_in_operations(self):
+        """ A conflict flushed while validating a later op returns 409. """
+        other = self.create('factory2')
+        ops = [
+            {**node, 'op': 'update', 'name': node['name'] + 'x'}
+            for node in (self.node, other)
+        ]
+
+        def validate_behind(node, data):
+            write_row(node)
+            return validate_update(node, data)
+
+        with mock.patch(
+                'app.nodes.views.validate_update',
+                side_effect=validate_behind):
+            response = self.send_json('POST', '/api/nodes/batch/', ops)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Node.query.get(other['id']).name, 'factory2')
+
+
+class TestSubtreeEtags(BaseTestCase):
+    """ Subtree GETs are tagged with the tree version and encoding. """
+
+    def setUp(self):
+        """ Creates a factory with three children. """
+        super().setUp()
+        self.url = f"/api/nodes/{self.create('factory1')['id']}/"
+        self.send_json('POST', self.url + 'nodes/', {'count': 3})
+
+    def test_child_change_changes_etag(self):
+        """ Deleting a child invalidates the parent's ETag. """
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        child = response.json['children'][0]['id']
+
+        self.client.delete(f'/api/nodes/{child}/')
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(len(response.json['children']), 2)
+
+    def test_unchanged_tree_is_not_modified(self):
+        """ Repeating a GET with its ETag returns 304. """
+        etag = self.client.get(self.url).headers['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_encodings_have_own_etags(self):
+        """ JSON and columnar bodies of the same subtree differ in ETag. """
+        columnar = 'application/vnd.nodes.columnar+json'
+        nested = self.client.get(self.url)
+        response = self.client.get(self.url, headers={'Accept': columnar})
+
+        self.assertEqual(response.mimetype, columnar)
+        self.assertNotEqual(response.headers['ETag'], nested.headers['ETag'])
@@ -0,0 +1,501 @@
+""" Module for materializing whole Node trees with indexed path scans. """
+# Modules
+from collections import defaultdict
+
+from sqlalchemy import case, exists, func, or_, select
+
+# db
+from app import db
+from app.cache import root_cache
+from app.models import Node, path_ancestor_ids
+
+
+def _columns(table):
+    """ Returns the columns needed to serialize a Node row.
+
+    Args:
+        table (Table): Node table or an alias of it.
+
+    Returns:
+        list: Columns in the order expected by `build_tree`.
+    """
+    return [
+        table.c.id,
+        table.c.parent_id,
+        table.c.name,
+        table.c.min_num,
+        table.c.max_num,
+        table.c.can_have_children,
+        table.c.path,
+    ]
+
+
+def path_order(table):
+    """ Returns the path of `table` compared byte by byte, for ORDER BY.
+
+    Notes:
+        In byte order '/' sorts before the digits, so every Node comes
+        right after its parent and before the next sibling of any of its
+        ancestors. SQLite always compares this way, Postgres only under the
+        "C" collation, locales like en_US ignore the '/'.
+
+    Args:
+        table (Table): Node table or an alias of it.
+
+    Returns:
+        ColumnElement: Expression to order the rows by.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return table.c.path.collate('C')
+
+    return table.c.path
+
+
+def subtree_clause(root_ids):
+    """ Returns a WHERE clause matching every Node in the subtrees.
+
+    Notes:
+        Looks up the paths of `root_ids` by primary key, each subtree is then
+        an indexed prefix range on `node.path`.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+
+    Returns:
+        ClauseElement: Clause for `node`, None if no root exists.
+    """
+    node = Node.__table__
+    paths = db.session.execute(
+        select([node.c.path]).where(node.c.id.in_(root_ids))
+    ).fetchall()
+
+    if not paths:
+        return None
+
+    return or_(*[node.c.path.like(path + '%') for path, in paths])
+
+
+def fetch_subtree_rows(root_ids):
+    """ Fetches the rows of every Node in the subtrees of `root_ids`.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+
+    Returns:
+        list: Node rows, including the roots, sorted by id.
+    """
+    clause = subtree_clause(root_ids) if root_ids else None
+
+    if clause is None:
+        return []
+
+    node = Node.__table__
+    query = select(_columns(node)).where(clause).order_by(node.c.id)
+    return db.session.execute(query).fetchall()
+
+
+def row_to_dict(row):
+    """ Returns the json serializable dict of a Node row, without children.
+
+    Args:
+        row (RowProxy): Node row selected with `_columns`.
+
+    Returns:
+        dict: Key value pairs of essential Node data.
+    """
+    return {
+        'id':                row.id,
+        'name':              row.name,
+        'min_num':           row.min_num,
+        'max_num':           row.max_num,
+        'parent_id':         row.parent_id,
+        'can_have_children': row.can_have_children
+    }
+
+
+def build_tree(rows, root_ids, counts=None):
+    """ Assembles nested Node dicts from flat rows in O(n).
+
+    Notes:
+        Produces the same structure as the recursive `Node.serialize` used
+        to, children are ordered by id.
+
+    Args:
+        rows (list): Node rows sorted by id.
+        root_ids (list): Ids of the nodes to return.
+        counts (dict): Optional amount of children per node id, added as
+            `children_count` to nodes that can have children.
+
+    Returns:
+        list: Serialized trees, one per root id found in `rows`.
+    """
+    nodes = {}
+    children = defaultdict(list)
+
+    for row in rows:
+        data = row_to_dict(row)
+        nodes[row.id] = data
+        children[row.parent_id].append(data)
+
+    for pk, data in nodes.items():
+        if data['can_have_children']:
+            data['children'] = children.get(pk, [])
+
+            if counts is not None:
+                data['children_count'] = counts.get(pk, 0)
+
+    return [nodes[pk] for pk in root_ids if pk in nodes]
+
+
+def rows_to_columns(rows, root_ids):
+    """ Lays out Node rows as parallel arrays.
+
+    Notes:
+        Keys are sent once instead of once per node, which makes the payload
+        smaller and faster to parse than nested dicts. Rows are ordered by
+        path so every parent comes before its children and clients can
+        rebuild the tree in a single pass.
+
+    Args:
+        rows (list): Node rows selected with `_columns`.
+        root_ids (list): Ids of the subtree roots.
+
+    Returns:
+        dict: `roots` plus one list per Node attribute.
+    """
+    rows = sorted(rows, key=lambda row: row.path)
+
+    return {
+        'roots':             list(root_ids),
+        'id':                [row.id for row in rows],
+        'parent_id':         [row.parent_id for row in rows],
+        'name':              [row.name for row in rows],
+        'min_num':           [row.min_num for row in rows],
+        'max_num':           [row.max_num for row in rows],
+        'can_have_children': [row.can_have_children for row in rows],
+    }
+
+
+def load_children(parent_id):
+    """ Serializes the direct children of a Node without their subtrees.
+
+    Args:
+        parent_id (int): Id of the parent node.
+
+    Returns:
+        list: Flat child dicts ordered by id.
+    """
+    node = Node.__table__
+    query = select(_columns(node)) \
+        .where(node.c.parent_id == parent_id) \
+        .order_by(node.c.id)
+    return [row_to_dict(row) for row in db.session.execute(query)]
+
+
+def load_subtrees(root_ids):
+    """ Serializes the subtrees of `root_ids` with a single range scan.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+
+    Returns:
+        list: Serialized trees in the order of `root_ids`.
+    """
+    root_ids = list(root_ids)
+    return build_tree(fetch_subtree_rows(root_ids), root_ids)
+
+
+def load_subtree_columns(root_ids):
+    """ Serializes the subtrees of `root_ids` as parallel arrays.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+
+    Returns:
+        dict: Value of `rows_to_columns`.
+    """
+    root_ids = list(root_ids)
+    return rows_to_columns(fetch_subtree_rows(root_ids), root_ids)
+
+
+def load_subtrees_paged(root_ids, depth=None, limit=None, after=None):
+    """ Serializes the top of the subtrees of `root_ids`, level by level.
+
+    Notes:
+        Costs one query per level plus one to count children, every node
+        that can have children gets a `children_count` so clients know what
+        is left to fetch.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+        depth (int): Levels below the roots to include, None for all.
+        limit (int): Maximum children per node, the lowest ids first.
+        after (int): Only include root children with a greater id.
+
+    Returns:
+        list: Serialized trees in the order of `root_ids`.
+    """
+    node = Node.__table__
+    root_ids = list(root_ids)
+    level_rows = db.session.execute(
+        select(_columns(node)).where(node.c.id.in_(root_ids))
+    ).fetchall() if root_ids else []
+    rows = list(level_rows)
+    level = 0
+
+    while level_rows and (depth is None or level < depth):
+        parent_ids = [row.id for row in level_rows if row.can_have_children]
+
+        if not parent_ids:
+            break
+
+        query = select(_columns(node)).where(node.c.parent_id.in_(parent_ids))
+
+        if after is not None and level == 0:
+            query = query.where(node.c.id > after)
+
+        if limit is not None:
+            rank = func.row_number().over(
+                partition_by=node.c.parent_id, order_by=node.c.id)
+            ranked = query.column(rank.label('rank')).alias('ranked')
+            query = select(_columns(ranked)).where(ranked.c.rank <= limit)
+
+        level_rows = db.session.execute(query).fetchall()
+        rows.extend(level_rows)
+        level += 1
+
+    parent_ids = [row.id for row in rows if row.can_have_children]
+    counts = {}
+
+    if parent_ids:
+        counts = dict(db.session.execute(
+            select([node.c.parent_id, func.count(node.c.id)])
+            .where(node.c.parent_id.in_(parent_ids))
+            .group_by(node.c.parent_id)
+        ).fetchall())
+
+    rows.sort(key=lambda row: row.id)
+    return build_tree(rows, root_ids, counts)
+
+
+def load_subtree(root_id):
+    """ Serializes the subtree of a single Node.
+
+    Args:
+        root_id (int): Id of the subtree root.
+
+    Returns:
+        dict: Serialized tree or None if the node doesn't exist.
+    """
+    trees = load_subtrees([root_id])
+    return trees[0] if trees else None
+
+
+def get_root_ids():
+    """ Returns the id of the tree root as a list.
+
+    Returns:
+        list: Root node id, empty if there is no root.
+    """
+    root_id = root_cache.get()
+    return [root_id] if root_id is not None else []
+
+
+def load_root_trees():
+    """ Serializes the tree hanging from the Root node.
+
+    Returns:
+        list: Serialized Root trees.
+    """
+    return load_subtrees(get_root_ids())
+
+
+def load_root_columns():
+    """ Serializes the tree hanging from the Root node as parallel arrays.
+
+    Returns:
+        dict: Value of `rows_to_columns`.
+    """
+    return load_subtree_columns(get_root_ids())
+
+
+def _range_stats(row, column):
+    """ Groups the min, max and avg of a column read from an aggregate row.
+
+    Args:
+        row (RowProxy): Row holding `<column>_min`, `_max` and `_avg`.
+        column (str): Value of column name.
+
+    Returns:
+        dict: Aggregates of the column, None values for an empty subtree.
+    """
+    average = row[f'{column}_avg']
+
+    return {
+        'min': row[f'{column}_min'],
+        'max': row[f'{column}_max'],
+        'avg': float(average) if average is not None else None,
+    }
+
+
+def subtree_stats(root_id):
+    """ Aggregates the descendants of a Node in a single query.
+
+    Notes:
+        The descendants are an indexed prefix range on `node.path`, leaves
+        are descendants without children (an anti join on the parent_id
+        index) and depth is counted from the separators of the path.
+
+    Args:
+        root_id (int): Id of the subtree root.
+
+    Returns:
+        dict: Counts and `min_num` / `max_num` aggregates of the
+            descendants, None if the node doesn't exist.
+    """
+    node = Node.__table__
+    path = db.session.execute(
+        select([node.c.path]).where(node.c.id == root_id)
+    ).scalar()
+
+    if path is None:
+        return None
+
+    child = node.alias('child')
+    is_leaf = ~exists().where(child.c.parent_id == node.c.id)
+    depth = func.length(node.c.path) - \
+        func.length(func.replace(node.c.path, '/', ''))
+
+    row = db.session.execute(
+        select([
+            func.count(node.c.id).label('descendants'),
+            func.count(case([(is_leaf, node.c.id)])).label('leaves'),
+            func.max(depth).label('depth'),
+            func.min(node.c.min_num).label('min_num_min'),
+            func.max(node.c.min_num).label('min_num_max'),
+            func.avg(node.c.min_num).label('min_num_avg'),
+            func.min(node.c.max_num).label('max_num_min'),
+            func.max(node.c.max_num).label('max_num_max'),
+            func.avg(node.c.max_num).label('max_num_avg'),
+        ])
+        .where(node.c.path.like(path + '%'))
+        .where(node.c.id != root_id)
+    ).first()
+
+    return {
+        'id': root_id,
+        'descendants': row['descendants'],
+        'leaves': row['leaves'],
+        'depth': row['depth'] - path.count('/') if row['depth'] else 0,
+        'min_num': _range_stats(row, 'min_num'),
+        'max_num': _range_stats(row, 'max_num'),
+    }
+
+
+def _like_escape(value):
+    """ Escapes the LIKE wildcards of a user supplied value.
+
+    Args:
+        value (str): Raw search text.
+
+    Returns:
+        str: Text matching itself literally with `escape='\\'`.
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%') \
+        .replace('_', '\\_')
+
+
+def search_nodes(name=None, match='prefix', min_num=None, max_num=None,
+                 root=None, limit=100, after=None):
+    """ Finds Nodes by name and range with one indexed query.
+
+    Notes:
+        Prefix matches use the varchar_pattern_ops index on name, substring
+        matches the trigram one and ranges the (min_num, max_num) index.
+        Ancestors come from the path column of each match, so no extra
+        query is needed however deep the matches are.
+
+    Args:
+        name (str): Text to match against names.
+        match (str): 'prefix' or 'contains'.
+        min_num (int): Only ranges ending at or above this value.
+        max_num (int): Only ranges starting at or below this value.
+        root (Node): Only search the subtree of this node.
+        limit (int): Maximum amount of matches.
+        after (int): Only matches with a greater id, for paging.
+
+    Returns:
+        tuple: Flat matches with their `ancestor_ids`, ordered by id, and
+            the `after` value of the next page or None if there is none.
+    """
+    node = Node.__table__
+    query = select(_columns(node))
+
+    if name is not None:
+        pattern = _like_escape(name)
+        pattern = pattern + '%' if match == 'prefix' else f'%{pattern}%'
+        query = query.where(node.c.name.like(pattern, escape='\\'))
+
+    if min_num is not None:
+        query = query.where(node.c.max_num >= min_num)
+
+    if max_num is not None:
+        query = query.where(node.c.min_num <= max_num)
+
+    if root is not None:
+        query = query.where(node.c.path.like(root.path + '%'))
+
+    if after is not None:
+        query = query.where(node.c.id > after)
+
+    rows = db.session.execute(
+        query.order_by(node.c.id).limit(limit + 1)
+    ).fetchall()
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+
+    results = [
+        {**row_to_dict(row), 'ancestor_ids': path_ancestor_ids(row.path)}
+        for row in rows[:limit]
+    ]
+    return results, next_after
+
+
+def iter_subtree_rows(root_ids, chunk_size=1000):
+    """ Streams the rows of the subtrees of `root_ids` in depth first order.
+
+    Notes:
+        Rows are ordered by `path_order`, so every node comes right after its
+        parent and siblings come in path order, e.g. 10 before 2. The result
+        is read through a server side cursor `chunk_size` rows at a time so
+        memory stays bounded regardless of the tree size.
+
+    Args:
+        root_ids (list): Ids of the subtree roots.
+        chunk_size (int): Amount of rows fetched per round trip.
+
+    Yields:
+        list: Chunks of Node rows.
+    """
+    clause = subtree_clause(root_ids) if root_ids else None
+
+    if clause is None:
+        return
+
+    node = Node.__table__
+    query = select(_columns(node)) \
+        .where(clause) \
+        .order_by(path_order(node)) \
+        .execution_options(stream_results=True)
+    result = db.session.execute(query)
+
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+
+            if not rows:
+                break
+
+            yield rows
+
+    finally:
+        result.close()
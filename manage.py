@@ -3,30 +3,45 @@
 This module defines this projects migration manager.
 """
 import os
+import sys
 import unittest
-import coverage
 
+# The cov command re-runs this script with FLASK_COVERAGE set, so coverage
+# is only imported, and started before the app, when it is needed.
+COV = None
+
+if os.environ.get('FLASK_COVERAGE'):
+    import coverage
+
+    COV = coverage.coverage(
+        branch=True,
+        include='app/*',
+        omit=[
+            'app/tests/*',
+            'app/config.py',
+            'app/*/__init__.py'
+        ]
+    )
+    COV.start()
+
+from flask import current_app
 from flask_migrate import Migrate, MigrateCommand
 from flask_script import Manager
 
-COV = coverage.coverage(
-    branch=True,
-    include='app/*',
-    omit=[
-        'app/tests/*',
-        'app/config.py',
-        'app/*/__init__.py'
-    ]
-)
+from app import create_app, db
 
-COV.start()
+migrate = Migrate()
+
+
+def make_app():
+    """Creates the app when a command runs, not when the script loads."""
+    app = create_app()
+    migrate.init_app(app, db)
+    return app
 
-from app import app, db
-from app.models import Node
 
 # Create Instances.
-migrate = Migrate(app, db)
-manager = Manager(app)
+manager = Manager(make_app)
 
 # Add method.
 manager.add_command('db', MigrateCommand)
@@ -45,6 +60,10 @@ def test():
 @manager.command
 def cov():
     """Runs the unit tests with coverage."""
+    if COV is None:
+        os.environ['FLASK_COVERAGE'] = '1'
+        os.execvp(sys.executable, [sys.executable] + sys.argv)
+
     tests = unittest.TestLoader().discover('app/', pattern='test*.py')
     result = unittest.TextTestRunner(verbosity=2).run(tests)
     if result.wasSuccessful():
@@ -61,12 +80,93 @@ def cov():
     return 1
 
 
+@manager.option('-c', '--count', dest='count', type=int, default=1000)
+@manager.option('-r', '--runs', dest='runs', type=int, default=5)
+def bench_sub_nodes(count, runs):
+    """Compares rows/sec of ORM and bulk sub node generation."""
+    from app import benchmarks
+
+    results = benchmarks.bench_sub_nodes(count, runs)
+    for label, rows_per_sec in results.items():
+        print(f'{label:>5}: {rows_per_sec:,.0f} rows/sec')
+    print(f'speedup: {results["bulk"] / results["orm"]:.1f}x')
+
+
+@manager.option('-u', '--url', dest='url',
+                default='http://localhost:8000/api/nodes/')
+@manager.option('-c', '--concurrency', dest='concurrency', type=int,
+                default=50)
+@manager.option('-n', '--requests', dest='total', type=int, default=1000)
+def load_test(url, concurrency, total):
+    """Measures throughput and latency of a running server."""
+    from app import benchmarks
+
+    results = benchmarks.load_test(url, concurrency, total)
+    for key, value in results.items():
+        print(f'{key}: {value}')
+
+
+@manager.option('-d', '--depth', dest='depth', type=int, default=3)
+@manager.option('-f', '--fanout', dest='fanout', type=int, default=10)
+@manager.option('-n', '--nodes', dest='total', type=int, default=1000)
+@manager.option('-r', '--runs', dest='runs', type=int, default=50)
+@manager.option('-c', '--clients', dest='clients', type=int, default=50)
+@manager.option('-o', '--output', dest='output',
+                default='bench-results.jsonl')
+def bench(depth, fanout, total, runs, clients, output):
+    """Measures latency of the node API on a seeded tree."""
+    from app import benchmarks
+
+    app = current_app._get_current_object()
+    results = benchmarks.bench_api(app, depth, fanout, total, runs, clients)
+    benchmarks.write_results(results, output)
+
+    print(f'{results["shape"]["nodes"]} nodes on {results["database"]}')
+    for label, summary in results['results'].items():
+        if summary is None:
+            print(f'{label:>16}: skipped')
+            continue
+        print(f'{label:>16}: {summary["ops_per_sec"]:,.0f} ops/sec, '
+              f'p50 {summary["p50_ms"]:.2f} ms, '
+              f'p99 {summary["p99_ms"]:.2f} ms')
+    print(f'results appended to {output}')
+
+
+@manager.option('-r', '--runs', dest='runs', type=int, default=5)
+def bench_startup(runs):
+    """Measures how long a new process takes to import and create the app."""
+    from app import benchmarks
+
+    for phase, summary in benchmarks.bench_startup(runs).items():
+        print(f'{phase:>10}: p50 {summary["p50_ms"]:.0f} ms, '
+              f'p99 {summary["p99_ms"]:.0f} ms')
+
+
+@manager.option('-r', '--runs', dest='runs', type=int, default=10)
+def bench_json(runs):
+    """Compares the JSON libraries on trees of realistic sizes."""
+    from app import benchmarks
+
+    for size, libraries in benchmarks.bench_json(runs=runs).items():
+        for name, result in libraries.items():
+            print(f'{size:>7} nodes {name:>6}: {result["dumps_ms"]:8.2f} ms, '
+                  f'{result["bytes"]:,} bytes')
+
+
 @manager.command
 def create_db():
     """Creates the db tables."""
     db.create_all()
 
 
+@manager.command
+def create_root():
+    """Creates the Root node if there is none."""
+    from app.models import Node
+
+    print(Node.create_root())
+
+
 @manager.command
 def drop_db():
     """Drops the db tables."""
@@ -0,0 +1,47 @@
+"""add node materialized path
+
+Revision ID: 34f4a37df8cd
+Revises: ebb65d877474
+Create Date: 2026-10-18 09:12:44.512306
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '34f4a37df8cd'
+down_revision = 'ebb65d877474'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('node', sa.Column('path', sa.String(), nullable=True))
+
+    # Backfill one tree level per statement, starting at the roots.
+    op.execute(
+        "UPDATE node SET path = CAST(id AS VARCHAR) || '/' "
+        "WHERE parent_id IS NULL"
+    )
+    connection = op.get_bind()
+    updated = True
+
+    while updated:
+        updated = connection.execute(
+            "UPDATE node SET path = ("
+            "    SELECT parent.path FROM node AS parent"
+            "    WHERE parent.id = node.parent_id"
+            ") || CAST(id AS VARCHAR) || '/' "
+            "WHERE path IS NULL AND parent_id IN ("
+            "    SELECT id FROM node WHERE path IS NOT NULL"
+            ")"
+        ).rowcount
+
+    op.create_index(
+        'ix_node_path', 'node', ['path'], unique=False,
+        postgresql_ops={'path': 'varchar_pattern_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_node_path', table_name='node')
+    op.drop_column('node', 'path')
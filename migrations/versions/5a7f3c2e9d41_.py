@@ -0,0 +1,27 @@
+"""add tree_change table
+
+Revision ID: 5a7f3c2e9d41
+Revises: e4d2a9b81c53
+Create Date: 2026-10-18 11:27:52.609114
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5a7f3c2e9d41'
+down_revision = 'e4d2a9b81c53'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('tree_change',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade():
+    op.drop_table('tree_change')
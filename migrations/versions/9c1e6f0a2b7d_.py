@@ -0,0 +1,77 @@
+"""add unique node name index
+
+Revision ID: 9c1e6f0a2b7d
+Revises: 34f4a37df8cd
+Create Date: 2026-10-18 10:02:17.044921
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9c1e6f0a2b7d'
+down_revision = '34f4a37df8cd'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Length of node.name.
+NAME_LENGTH = 255
+
+
+def unique_name(name, node_id, taken):
+    """ Returns `name` suffixed with `node_id`, unique among `taken`.
+
+    Args:
+        name (str): Duplicated factory name.
+        node_id (int): Id of the renamed node.
+        taken (set): Factory names already in use.
+
+    Returns:
+        str: Name of at most NAME_LENGTH characters, not in `taken`.
+    """
+    suffix, attempt = f'-{node_id}', 0
+
+    while True:
+        candidate = name[:NAME_LENGTH - len(suffix)] + suffix
+
+        if candidate not in taken:
+            return candidate
+
+        attempt += 1
+        suffix = f'-{node_id}-{attempt}'
+
+
+def upgrade():
+    # Renames used to allow duplicate factory names, every duplicate but the
+    # oldest gets its id appended so the unique index can be built. Names
+    # are truncated to fit and checked against every factory name, e.g. an
+    # existing "foo-12", so the index build can't fail halfway.
+    connection = op.get_bind()
+    rows = connection.execute(
+        "SELECT id, name FROM node WHERE can_have_children ORDER BY id"
+    ).fetchall()
+    taken = {name for _, name in rows}
+    seen = set()
+
+    for node_id, name in rows:
+        if name not in seen:
+            seen.add(name)
+            continue
+
+        renamed = unique_name(name, node_id, taken)
+        taken.add(renamed)
+        connection.execute(
+            sa.text("UPDATE node SET name = :name WHERE id = :id"),
+            name=renamed, id=node_id
+        )
+
+    # Generated leaves (can_have_children false) reuse random number names.
+    op.create_index(
+        'uq_node_name', 'node', ['name'], unique=True,
+        postgresql_where=sa.text('can_have_children'),
+        sqlite_where=sa.text('can_have_children')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_node_name', table_name='node')
@@ -0,0 +1,33 @@
+"""add regeneration_job table
+
+Revision ID: b3f1d6a0c7e2
+Revises: 5a7f3c2e9d41
+Create Date: 2026-10-18 15:04:31.218734
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1d6a0c7e2'
+down_revision = '5a7f3c2e9d41'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('regeneration_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('root_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('done', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('regeneration_job')
@@ -0,0 +1,38 @@
+"""add node search indexes
+
+Revision ID: d8a4c2f7e1b9
+Revises: b3f1d6a0c7e2
+Create Date: 2026-10-18 15:41:09.873012
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd8a4c2f7e1b9'
+down_revision = 'b3f1d6a0c7e2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.create_index(
+        'ix_node_name_pattern', 'node', ['name'], unique=False,
+        postgresql_ops={'name': 'varchar_pattern_ops'}
+    )
+    op.create_index(
+        'ix_node_name_trgm', 'node', ['name'], unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_node_range', 'node', ['min_num', 'max_num'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_node_range', table_name='node')
+    op.drop_index('ix_node_name_trgm', table_name='node')
+    op.drop_index('ix_node_name_pattern', table_name='node')
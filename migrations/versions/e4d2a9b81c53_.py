@@ -0,0 +1,40 @@
+"""add node is_root flag
+
+Revision ID: e4d2a9b81c53
+Revises: 9c1e6f0a2b7d
+Create Date: 2026-10-18 10:41:05.318270
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e4d2a9b81c53'
+down_revision = '9c1e6f0a2b7d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('node', sa.Column(
+        'is_root', sa.Boolean(), nullable=False,
+        server_default=sa.text('false')
+    ))
+
+    # The oldest top level node named Root becomes the designated root.
+    op.execute(
+        "UPDATE node SET is_root = true WHERE id = ("
+        "    SELECT min(id) FROM node"
+        "    WHERE name = 'Root' AND parent_id IS NULL"
+        ")"
+    )
+
+    op.create_index(
+        'uq_node_is_root', 'node', ['is_root'], unique=True,
+        postgresql_where=sa.text('is_root'),
+        sqlite_where=sa.text('is_root')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_node_is_root', table_name='node')
+    op.drop_column('node', 'is_root')
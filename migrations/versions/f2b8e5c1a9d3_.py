@@ -0,0 +1,24 @@
+"""add node version column
+
+Revision ID: f2b8e5c1a9d3
+Revises: d8a4c2f7e1b9
+Create Date: 2026-10-18 16:12:47.304519
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8e5c1a9d3'
+down_revision = 'd8a4c2f7e1b9'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('node', sa.Column(
+        'version', sa.Integer(), server_default=sa.text('1'), nullable=False
+    ))
+
+
+def downgrade():
+    op.drop_column('node', 'version')
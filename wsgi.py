@@ -0,0 +1,4 @@
+""" WSGI entry point, e.g. `gunicorn --worker-class eventlet wsgi:app`. """
+from app import create_app
+
+app = create_app()